@@ -0,0 +1,73 @@
+"""
+db4e/Modules/AsyncDbMgr.py
+
+   Database 4 Everything
+   Author: Nadim-Daniel Ghaznavi
+   Copyright (c) 2024-2025 NadimGhaznavi <https://github.com/NadimGhaznavi/db4e>
+   License: GPL 3.0
+
+Awaitable access to MongoDB for the Textual event loop. The blocking
+pymongo calls run in a small thread pool and every call has a timeout.
+A call that's cancelled or timed out returns right away, but its worker
+thread keeps running until the pymongo operation finishes. The pymongo
+operations are bounded by the same timeout, so that's at most 'timeout'
+seconds.
+"""
+
+import asyncio
+import functools
+import threading
+import pymongo
+from concurrent.futures import ThreadPoolExecutor
+
+from db4e.Modules.DbMgr import DbMgr
+
+# Seconds before a database call from the UI is given up on
+DB_TIMEOUT = 5
+# Worker threads, shared by all AsyncDbMgr instances
+DB_WORKERS = 4
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=DB_WORKERS, thread_name_prefix='AsyncDbMgr')
+        return _executor
+
+
+class AsyncDbMgr:
+
+    def __init__(self, db: DbMgr, timeout: float = DB_TIMEOUT):
+        self.db = db
+        self.timeout = timeout
+
+    async def call(self, func, *args, timeout: float = None, **kwargs):
+        # Run any blocking function (e.g. DeploymentMgr.get_deployment) in the
+        # thread pool. Raises TimeoutError, or CancelledError if the awaiting
+        # task is cancelled (e.g. a Textual worker the user navigated away from).
+        timeout = timeout or self.timeout
+        loop = asyncio.get_running_loop()
+        job = functools.partial(self._run, func, timeout, args, kwargs)
+        return await asyncio.wait_for(loop.run_in_executor(get_executor(), job), timeout)
+
+    async def find_many(self, col_name, filter, timeout: float = None):
+        # The cursor is consumed in the worker thread
+        return await self.call(lambda: list(self.db.find_many(col_name, filter)), timeout=timeout)
+
+    async def find_one(self, col_name, filter, timeout: float = None):
+        return await self.call(self.db.find_one, col_name, filter, timeout=timeout)
+
+    async def insert_one(self, col_name, jdoc, timeout: float = None):
+        return await self.call(self.db.insert_one, col_name, jdoc, timeout=timeout)
+
+    async def update_one(self, col_name, filter, new_values, upsert=False, timeout: float = None):
+        return await self.call(self.db.update_one, col_name, filter, new_values, upsert, timeout=timeout)
+
+    def _run(self, func, timeout, args, kwargs):
+        # Bound the pymongo operations in this thread too
+        with pymongo.timeout(timeout):
+            return func(*args, **kwargs)
@@ -0,0 +1,127 @@
+"""
+db4e/Modules/ClientRegistry.py
+
+   Database 4 Everything
+   Author: Nadim-Daniel Ghaznavi
+   Copyright (c) 2024-2025 NadimGhaznavi <https://github.com/NadimGhaznavi/db4e>
+   License: GPL 3.0
+
+One pooled MongoClient per MongoDB server, shared by every manager in the
+process. MongoClient is thread-safe and does its own connection pooling,
+creating one per manager only multiplies the connection handshakes.
+
+connect() is the connect phase: MongoClient() connects lazily, so the
+server is pinged, with exponential backoff, for at most 'connect_budget'
+seconds. While the server is down connect() fails fast and only pings
+again every 'retry_timeout' seconds.
+"""
+
+import time
+import threading
+import pymongo
+from pymongo import MongoClient
+from pymongo.errors import PyMongoError
+
+from db4e.Modules.ConfigMgr import Config
+
+# MongoClient settings, can be overridden in the 'db' section of the config
+CLIENT_DEFAULTS = {
+    'max_pool_size': 20,
+    'connect_timeout_ms': 2000,
+    'server_selection_timeout_ms': 5000,
+    'socket_timeout_ms': 20000,
+}
+
+# Seconds the connect phase may take, see connect()
+CONNECT_BUDGET = 1
+# The first ping gets CONNECT_BACKOFF seconds, every retry twice as long
+# as the one before, up to CONNECT_BACKOFF_MAX
+CONNECT_BACKOFF = 0.05
+CONNECT_BACKOFF_MAX = 0.4
+# Seconds between the connect attempts while the server is down
+RETRY_TIMEOUT = 15
+
+_clients = {}
+_lock = threading.Lock()
+# URI -> (online, time.monotonic() of the last connect attempt)
+_status = {}
+
+
+def client_options(config: Config):
+    db = config.config['db']
+    return {
+        'maxPoolSize': db.get('max_pool_size', CLIENT_DEFAULTS['max_pool_size']),
+        'connectTimeoutMS': db.get('connect_timeout_ms', CLIENT_DEFAULTS['connect_timeout_ms']),
+        'serverSelectionTimeoutMS': db.get('server_selection_timeout_ms',
+                                           CLIENT_DEFAULTS['server_selection_timeout_ms']),
+        'socketTimeoutMS': db.get('socket_timeout_ms', CLIENT_DEFAULTS['socket_timeout_ms']),
+    }
+
+
+def close_clients():
+    with _lock:
+        for client in _clients.values():
+            client.close()
+        _clients.clear()
+        _status.clear()
+
+
+def connect(config: Config, budget: float = None):
+    # True if the server answers a ping within the budget
+    db = config.config['db']
+    uri = db_uri(config)
+    online, last_attempt = _status.get(uri, (False, None))
+    if online:
+        return True
+    if last_attempt is not None and \
+            time.monotonic() - last_attempt < db.get('retry_timeout', RETRY_TIMEOUT):
+        # Known to be down, don't hold up the caller
+        return False
+    if budget is None:
+        budget = db.get('connect_budget', CONNECT_BUDGET)
+    deadline = time.monotonic() + budget
+    backoff = CONNECT_BACKOFF
+    while True:
+        remaining = deadline - time.monotonic()
+        online = ping(config, min(backoff, remaining))
+        remaining = deadline - time.monotonic()
+        if online or remaining <= 0:
+            break
+        # Give mongod a moment before the next ping
+        time.sleep(min(backoff, remaining))
+        backoff = min(backoff * 2, CONNECT_BACKOFF_MAX)
+    _status[uri] = (online, time.monotonic())
+    return online
+
+
+def db_uri(config: Config):
+    db = config.config['db']
+    return f"mongodb://{db['server']}:{db['port']}"
+
+
+def get_client(config: Config):
+    # MongoClient() doesn't block, it connects in the background
+    uri = db_uri(config)
+    with _lock:
+        if uri not in _clients:
+            _clients[uri] = MongoClient(uri, **client_options(config))
+        return _clients[uri]
+
+
+def is_online(config: Config):
+    return _status.get(db_uri(config), (False, None))[0]
+
+
+def ping(config: Config, timeout: float):
+    # The timeout bounds the server selection too, so this fails fast
+    try:
+        with pymongo.timeout(max(timeout, 0.01)):
+            get_client(config).admin.command('ping')
+        return True
+    except PyMongoError:
+        return False
+
+
+def set_offline(config: Config):
+    # An operation failed, the next connect() pings again (after retry_timeout)
+    _status[db_uri(config)] = (False, time.monotonic())
@@ -43,9 +43,13 @@ class Config:
                 'bin_dir': 'bin',
                 'conf_dir': 'conf',
                 'db4e_dir': 'db4e',
+                # Copy of the deployment records, used while MongoDB is down
+                'depl_snapshot': '~/.cache/db4e/deployments.json',
                 'desc': 'Database 4 Everything',
                 'dev_dir': 'dev',
                 'log_dir': 'logs',
+                # Detail panes that are kept mounted, see PaneMgr
+                'max_panes': 4,
                 'process': 'db4e.sh',
                 'pypi_repository': 'https://pypi.org/pypi/db4e/json',
                 'refresh_interval': 15,
@@ -64,16 +68,35 @@ class Config:
                 'backup_dir': 'backups',
                 'backup_script':'db4e-backup.sh',
                 'collection': 'mining',
+                # Seconds the connect phase may take before db4e runs offline
+                'connect_budget': 1,
+                # MongoClient connection pool and timeouts
+                'connect_timeout_ms': 2000,
                 'depl_collection': 'depl',
                 'log_collection': 'logging',
                 # How many days of data to keep in the logging collection
                 'log_retention_days': 7,
                 'max_backups': 7,
+                'max_pool_size': 20,
                 'metrics_collection': 'metrics',
+                # Store the hashrate, sidechain miners and worker series in the
+                # metrics collection as a MongoDB (5.0+) time-series collection
+                'metrics_timeseries': False,
                 'name': 'db4e',
                 'port': 27017,
+                # Seconds between the connect attempts while running offline
                 'retry_timeout': 15,
+                # Capped collection with the latest real-time (rt_*) samples
+                'rt_collection': 'realtime',
+                # Samples kept per real-time series
+                'rt_samples': 1000,
                 'server': 'localhost',
+                'server_selection_timeout_ms': 5000,
+                'socket_timeout_ms': 20000,
+            },
+            'logging': {
+                # Console log level of the service, everything goes to the DB
+                'log_level': 'info',
             },
             'monerod': {
                 'blockchain_dir': 'monero-blockchain',
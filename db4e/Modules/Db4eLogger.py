@@ -0,0 +1,197 @@
+"""
+db4e/Modules/Db4eLogger.py
+
+   Database 4 Everything
+   Author: Nadim-Daniel Ghaznavi
+   Copyright (c) 2024-2025 NadimGhaznavi <https://github.com/NadimGhaznavi/db4e>
+   License: GPL 3.0
+
+Logging for db4e. The log records are written to the MongoDB logging
+collection by a background thread, in batches. The caller never waits on
+MongoDB: records are put on a bounded queue and, when the queue fills up,
+debug records are sampled and eventually records are dropped.
+"""
+
+import sys
+import queue
+import logging
+import threading
+from datetime import datetime, timezone
+from pymongo.errors import PyMongoError
+
+from db4e.Modules.ClientRegistry import connect, get_client, set_offline
+from db4e.Modules.ConfigMgr import Config
+
+LOG_LEVELS = {
+    'info': logging.INFO,
+    'debug': logging.DEBUG,
+    'warning': logging.WARNING,
+    'error': logging.ERROR,
+    'critical': logging.CRITICAL,
+}
+
+# Custom attributes that are copied from the log record into the document
+EXTRA_FIELDS = ('component', 'miner', 'new_file', 'file_type')
+
+# Records waiting to be written, the batch size and how long the writer
+# waits for a batch to fill up (seconds)
+QUEUE_SIZE = 10000
+BATCH_SIZE = 500
+FLUSH_INTERVAL = 1
+# Once the queue is half full only one in DEBUG_SAMPLE debug records is kept
+DEBUG_SAMPLE = 10
+
+
+class Db4eDbLogHandler(logging.Handler):
+
+    def __init__(self, config: Config, queue_size: int = QUEUE_SIZE,
+                 batch_size: int = BATCH_SIZE, flush_interval: float = FLUSH_INTERVAL):
+        super().__init__()
+        db = config.config['db']
+        self.ini = config
+        self.db_name = db['name']
+        self.log_collection = db['log_collection']
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.high_water = queue_size // 2
+        self.queue = queue.Queue(maxsize=queue_size)
+        # Counters, see stats()
+        self.dropped = 0
+        self.sampled = 0
+        self.written = 0
+        self.errors = 0
+        self._debug_count = 0
+        self._client = None
+        self._stop = threading.Event()
+        self._writer = threading.Thread(target=self._run, name='Db4eDbLogHandler', daemon=True)
+        self._writer.start()
+
+    def close(self):
+        # Write whatever is still queued and stop the writer thread
+        self._stop.set()
+        self._writer.join()
+        super().close()
+
+    def emit(self, record):
+        if record.levelno <= logging.DEBUG and self.queue.qsize() >= self.high_water:
+            # Under pressure, keep one in DEBUG_SAMPLE debug records
+            self._debug_count += 1
+            if self._debug_count % DEBUG_SAMPLE:
+                self.sampled += 1
+                return
+        log_entry = {
+            'timestamp': datetime.fromtimestamp(record.created, timezone.utc),
+            'level': record.levelname,
+            'message': record.getMessage(),
+        }
+        for attr in EXTRA_FIELDS:
+            if hasattr(record, attr):
+                log_entry[attr] = getattr(record, attr)
+        try:
+            self.queue.put_nowait(log_entry)
+        except queue.Full:
+            self.dropped += 1
+
+    def stats(self):
+        return {
+            'queue_depth': self.queue.qsize(),
+            'dropped': self.dropped,
+            'sampled': self.sampled,
+            'written': self.written,
+            'errors': self.errors,
+        }
+
+    def _next_batch(self):
+        # Block for the first record, then take whatever else is queued
+        try:
+            batch = [self.queue.get(timeout=self.flush_interval)]
+        except queue.Empty:
+            return []
+        while len(batch) < self.batch_size:
+            try:
+                batch.append(self.queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while not (self._stop.is_set() and self.queue.empty()):
+            batch = self._next_batch()
+            if batch:
+                self._write(batch)
+
+    def _write(self, batch):
+        if not connect(self.ini):
+            # Running offline, connect() only pings every retry_timeout seconds
+            self.dropped += len(batch)
+            return
+        try:
+            if not self._client:
+                # The shared client, not a DbMgr: DbMgr logs through this handler
+                self._client = get_client(self.ini)
+            self._client[self.db_name][self.log_collection].insert_many(batch, ordered=False)
+            self.written += len(batch)
+        except PyMongoError as e:
+            # Nowhere to log this to
+            self.errors += 1
+            self.dropped += len(batch)
+            set_offline(self.ini)
+            print(f'Db4eDbLogHandler: Failed to log to DB: {e}', file=sys.stderr)
+
+
+# One handler per process, shared by all of the loggers
+_db_handler = None
+_db_handler_lock = threading.Lock()
+
+
+def get_db_handler(config: Config):
+    global _db_handler
+    with _db_handler_lock:
+        if _db_handler is None:
+            _db_handler = Db4eDbLogHandler(config)
+        return _db_handler
+
+
+class Db4eLogger:
+
+    def __init__(self, component: str, config: Config):
+        self._component = component
+        self._logger = logging.getLogger(f'db4e.{component}')
+        # The logger itself always passes everything on, the handlers filter
+        self._logger.setLevel(logging.DEBUG)
+        self._logger.propagate = False
+        if not self._logger.handlers:
+            self._logger.addHandler(get_db_handler(config))
+            op = config.config.get('db4e', {}).get('op')
+            if op and op != 'run_ui':
+                # Console output would garble the TUI
+                log_level = config.config.get('logging', {}).get('log_level', 'info')
+                ch = logging.StreamHandler()
+                ch.setLevel(LOG_LEVELS[log_level.lower()])
+                ch.setFormatter(logging.Formatter(
+                    fmt='[%(asctime)s] [%(levelname)s] [%(name)s] %(message)s',
+                    datefmt='%Y-%m-%d %H:%M:%S'))
+                self._logger.addHandler(ch)
+
+    def shutdown(self):
+        # Flush and close all handlers
+        logging.shutdown()
+
+    def critical(self, message, extra=None):
+        self._log(logging.CRITICAL, message, extra)
+
+    def debug(self, message, extra=None):
+        self._log(logging.DEBUG, message, extra)
+
+    def error(self, message, extra=None):
+        self._log(logging.ERROR, message, extra)
+
+    def info(self, message, extra=None):
+        self._log(logging.INFO, message, extra)
+
+    def warning(self, message, extra=None):
+        self._log(logging.WARNING, message, extra)
+
+    def _log(self, level, message, extra):
+        extra = dict(extra or {}, component=self._component)
+        self._logger.log(level, message, extra=extra)
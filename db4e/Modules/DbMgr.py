@@ -8,20 +8,81 @@ db4e/Modules/DbManager.py
 """
 
 import time
-from pymongo import MongoClient
-from pymongo.errors import ConnectionFailure, CollectionInvalid
+import threading
+from datetime import datetime, timezone
+from pymongo import CursorType, UpdateOne
+from pymongo.errors import BulkWriteError, CollectionInvalid, ConnectionFailure, OperationFailure, PyMongoError
 
+from db4e.Modules.ClientRegistry import connect, db_uri, get_client, is_online, set_offline
 from db4e.Modules.ConfigMgr import Config
+from db4e.Modules.Db4eLogger import Db4eLogger
 from db4e.Templates.db.Deployment import DB4E_RECORD
 
+# Buffered writes are flushed when this many documents are queued or when
+# the oldest queued document is this many seconds old
+BULK_BATCH_SIZE = 500
+BULK_FLUSH_INTERVAL = 2
+
+# The real-time series (rt_mainchain_hashrate, rt_pool_hashrate,
+# rt_sidechain_hashrate and share_position) share one capped collection,
+# it's sized to hold 'rt_samples' of each. Samples are small, 256 bytes
+# per sample leaves plenty of room.
+RT_SERIES = 4
+RT_SAMPLE_SIZE = 256
+
+# Index specs, keyed by the collection's setting in the 'db' section of the
+# config. ensure_indexes() creates the ones that don't exist yet. Anything
+# besides 'keys' is passed on to create_index(). The logging collection's
+# TTL index is handled by ensure_log_ttl().
+INDEXES = {
+   'collection': [
+      # One record per doc_type and timestamp (and worker), the upserts in
+      # MiningDb rely on this. Records without a timestamp aren't covered.
+      {'keys': [('doc_type', 1), ('timestamp', 1), ('worker_name', 1)], 'unique': True,
+       'partialFilterExpression': {'timestamp': {'$exists': True}}},
+      # The wallet balance, log checkpoints and other records without a timestamp
+      {'keys': [('doc_type', 1), ('log_file', 1)]},
+   ],
+   'depl_collection': [
+      {'keys': [('doc_type', 1), ('component', 1), ('instance', 1)]},
+   ],
+   'metrics_collection': [
+      {'keys': [('series.doc_type', 1), ('series.worker_name', 1), ('timestamp', 1)]},
+   ],
+}
+
+# Time-series options for the metrics collection. P2Pool prints its stats
+# every few minutes, so the buckets are sized for minutes.
+METRICS_TIMESERIES = {
+   'timeField': 'timestamp',
+   'metaField': 'series',
+   'granularity': 'minutes',
+}
+
+# The query paths that should be served by an index, see index_report()
+# (the real-time samples are read backwards from the end of the capped
+# collection and don't need an index)
+_SINCE = datetime(1970, 1, 1, tzinfo=timezone.utc)
+QUERY_PATHS = {
+   'deployment': ('depl_collection', {'doc_type': 'deployment', 'component': 'db4e'}),
+   'hourly hashrates': ('collection', {'doc_type': 'pool_hashrate', 'timestamp': {'$gte': _SINCE}}),
+   'hourly worker stats': ('collection', {'doc_type': 'worker', 'timestamp': {'$gte': _SINCE}}),
+   'log checkpoint': ('collection', {'doc_type': 'log_checkpoint', 'log_file': ''}),
+   'log messages': ('log_collection', {'timestamp': {'$gte': _SINCE}}),
+   'shares found': ('collection', {'doc_type': 'share_found_event', 'timestamp': {'$gte': _SINCE}}),
+   'wallet balance': ('collection', {'doc_type': 'wallet_balance'}),
+}
+
 class DbMgr:
+
+   # (server, database) -> whether the time-series metrics are enabled, for
+   # the databases that init_db() already ran on
+   _initialized = {}
+   _init_lock = threading.Lock()
     
    def __init__(self, config: Config):
       self.ini = config
       # MongoDB settings
-      retry_timeout            = self.ini.config['db']['retry_timeout']
-      db_server                = self.ini.config['db']['server']
-      db_port                  = self.ini.config['db']['port']
       self.max_backups         = self.ini.config['db']['max_backups']
       self.db_name             = self.ini.config['db']['name']
       self.db_collection       = self.ini.config['db']['collection']
@@ -29,42 +90,199 @@ class DbMgr:
       self.log_collection      = self.ini.config['db']['log_collection']
       self.log_retention       = self.ini.config['db']['log_retention_days']
       self.metrics_collection  = self.ini.config['db']['metrics_collection']
-      # TODO Setup logging
-      #self.log = Db4eLogger('Db4eDb')
-
-      # Connect to MongoDB
-      db_uri = f'mongodb://{db_server}:{db_port}'
-      try:
-         self._client = MongoClient(db_uri)
-      except ConnectionFailure as e:
-         # TODO factor in the old Db4eLogger code....
-         #self.log.critical(f'Connection failed: {e}. Retrying in {retry_timeout} seconds...')
-         time.sleep(retry_timeout)
-      
+      self.metrics_timeseries  = self.ini.config['db'].get('metrics_timeseries', False)
+      self.rt_collection       = self.ini.config['db'].get('rt_collection', 'realtime')
+      self.rt_samples          = self.ini.config['db'].get('rt_samples', 1000)
+      self.log = Db4eLogger('DbMgr', config)
+
+      # Connect to MongoDB, the pooled client is shared with the other managers
+      self._client = get_client(config)
       self.db4e = self._client[self.db_name]
 
       # Used for backups
       self.db4e_dir = None
       self.repo_dir = None
-      self.init_db()             
+
+      # Whether init_db() ran (in this process) for the database, see get_collection()
+      self.ready = False
+
+      # Buffered writes: (col_name, doc_type, timestamp) -> (jdoc, on_insert)
+      self._bulk = {}
+      self._bulk_since = None
+
+      # Connect phase, bounded by the 'connect_budget'. If MongoDB isn't
+      # up (yet) we run offline, see connect().
+      if not self.connect():
+         self.log.warning(f'MongoDB ({db_uri(config)}) is not reachable, running offline')
+
+   def aggregate(self, col_name, pipeline):
+      col = self.get_collection(col_name)
+      return col.aggregate(pipeline)
+
+   def bulk_set(self, col_name, updates):
+      # Apply many (filter, new_values) updates with one unordered bulk_write()
+      if not updates:
+         return 0
+      collection = self.get_collection(col_name)
+      requests = [ UpdateOne(filter, {'$set': new_values}) for filter, new_values in updates ]
+      result = collection.bulk_write(requests, ordered=False)
+      return result.modified_count
+
+   def buffer_uniq_by_timestamp(self, col_name, jdoc, on_insert=None):
+      # The buffered version of insert_uniq_by_timestamp(). The document is
+      # written by flush(), on_insert() is called if it didn't exist yet.
+      key = (col_name, jdoc['doc_type'], jdoc['timestamp'])
+      if key not in self._bulk:
+         self._bulk[key] = (jdoc, on_insert)
+      if self._bulk_since is None:
+         self._bulk_since = time.monotonic()
+      if len(self._bulk) >= BULK_BATCH_SIZE or \
+            time.monotonic() - self._bulk_since >= BULK_FLUSH_INTERVAL:
+         self.flush()
+
+   def connect(self):
+      # True if MongoDB is reachable. Cheap once connected, and while MongoDB
+      # is down it only pings every 'retry_timeout' seconds. The database is
+      # initialized once per process, on the first successful connect.
+      if not connect(self.ini):
+         return False
+      key = (db_uri(self.ini), self.db_name)
+      with DbMgr._init_lock:
+         if key not in DbMgr._initialized:
+            # init_db() goes through get_collection() too
+            self.ready = True
+            try:
+               self.init_db()
+            except PyMongoError as e:
+               # E.g. an auth problem or a timeout, run offline and try again later
+               self.log.warning(f'Unable to initialize the {self.db_name} database: {e}')
+               self.ready = False
+               self.set_offline()
+               return False
+            DbMgr._initialized[key] = self.metrics_timeseries
+      self.metrics_timeseries = DbMgr._initialized[key]
+      self.ready = True
+      return True
+
+   def delete_one(self, col_name, filter):
+      collection = self.get_collection(col_name)
+      return collection.delete_one(filter)
 
    def ensure_indexes(self):
+      # Idempotent, only missing indexes are created
+      for col_key, specs in INDEXES.items():
+         col_name = self.ini.config['db'][col_key]
+         collection = self.get_collection(col_name)
+         existing = [ index['key'] for index in collection.index_information().values() ]
+         for spec in specs:
+            keys = spec['keys']
+            if keys in existing:
+               continue
+            options = { key: value for key, value in spec.items() if key != 'keys' }
+            try:
+               collection.create_index(keys, **options)
+               self.log.debug(f'Created index {keys} on {col_name}')
+            except OperationFailure as e:
+               # E.g. a unique index and duplicate records written by an older version
+               self.log.error(f'Unable to create index {keys} on {col_name}: {e}')
+
+   def ensure_log_ttl(self):
+      # MongoDB expires log records continuously once they're older than
+      # log_retention_days. The existing index is resized when the setting changes.
+      expire_secs = int(self.log_retention * 24 * 60 * 60)
       log_col = self.get_collection(self.log_collection)
-      if "timestamp_1" not in log_col.index_information():
-         log_col.create_index("timestamp")
-         # TODO self.log.debug("Created index on 'timestamp' for log collection.")
+      for name, index in log_col.index_information().items():
+         if index['key'] != [('timestamp', 1)]:
+            continue
+         if index.get('expireAfterSeconds') == expire_secs:
+            return
+         try:
+            self.db4e.command('collMod', self.log_collection,
+                              index={'keyPattern': {'timestamp': 1}, 'expireAfterSeconds': expire_secs})
+            self.log.info(f'Log retention set to {self.log_retention} days')
+            return
+         except OperationFailure as e:
+            # Servers older than 5.1 can't turn a regular index into a TTL index
+            self.log.warning(f'Recreating the {name} index on {self.log_collection}: {e}')
+            log_col.drop_index(name)
+      log_col.create_index('timestamp', expireAfterSeconds=expire_secs)
+      self.log.debug(f'Created TTL index on {self.log_collection}, {self.log_retention} days')
+
+   def find_many(self, col_name, filter):
+      col = self.get_collection(col_name)
+      return col.find(filter)
+
+   def find_latest(self, col_name, filter, limit=1):
+      # Newest first, in insertion order. Meant for capped collections,
+      # where this is a short backwards scan from the end.
+      col = self.get_collection(col_name)
+      return col.find(filter).sort('$natural', -1).limit(limit)
 
    def find_one(self, col_name, filter):
       col = self.get_collection(col_name)
       return col.find_one(filter)
 
+   def flush(self):
+      # Write the buffered documents, one unordered bulk_write() per collection.
+      # The upserts only set fields on insert, existing documents are left alone.
+      if not self._bulk:
+         return 0
+      batches = {}
+      for (col_name, doc_type, timestamp), (jdoc, on_insert) in self._bulk.items():
+         # Deliberately coarser than the unique (doc_type, timestamp, worker_name)
+         # index, same as insert_uniq_by_timestamp(). The buffered events
+         # don't have a worker_name, so for them both are the same key, and
+         # leaving it out keeps a 'worker_name: null' out of the documents.
+         request = UpdateOne({'doc_type': doc_type, 'timestamp': timestamp},
+                             {'$setOnInsert': jdoc}, upsert=True)
+         batches.setdefault(col_name, []).append((request, on_insert))
+      self._bulk = {}
+      self._bulk_since = None
+
+      num_inserted = 0
+      for col_name, batch in batches.items():
+         collection = self.get_collection(col_name)
+         try:
+            result = collection.bulk_write([request for request, _ in batch], ordered=False)
+            upserted = result.upserted_ids
+         except BulkWriteError as e:
+            self.log.error(f'Bulk write to {col_name} failed: {e.details["writeErrors"]}')
+            upserted = {doc['index']: doc['_id'] for doc in e.details['upserted']}
+         num_inserted += len(upserted)
+         for index in upserted:
+            on_insert = batch[index][1]
+            if on_insert:
+               on_insert()
+      return num_inserted
+
    def get_collection(self, col_name):
+      # MongoDB wasn't reachable when this DbMgr was created. Initialize the
+      # database before the first operation, otherwise e.g. the capped
+      # realtime collection is created as a regular one by the first insert.
+      # While offline this fails fast instead of waiting for the server
+      # selection timeout.
+      if not (self.ready and self.is_online()) and not self.connect():
+         raise ConnectionFailure(f'MongoDB ({db_uri(self.ini)}) is not reachable')
       return self.db4e[col_name]
 
    def get_new_rec(self, rec_type):
       if rec_type == 'db4e':
          return DB4E_RECORD
 
+   def inc_one(self, col_name, filter, increments, upsert=False):
+      # Atomic counters, e.g. the wallet balance. Works with Decimal128.
+      collection = self.get_collection(col_name)
+      return collection.update_one(filter, {'$inc': increments}, upsert=upsert)
+
+   def index_report(self):
+      # Which index (or 'COLLSCAN') the winning plan of each query path uses
+      report = {}
+      for name, (col_key, filter) in QUERY_PATHS.items():
+         collection = self.get_collection(self.ini.config['db'][col_key])
+         plan = collection.find(filter).explain()['queryPlanner']['winningPlan']
+         report[name] = ', '.join(self._plan_indexes(plan))
+      return report
+
    def init_db(self):
       # Make sure the 'db4e' database, core collections and indexes exist.
       db_col = self.db_collection
@@ -72,23 +290,100 @@ class DbMgr:
       depl_col = self.depl_collection
       metrics_col = self.metrics_collection
       db_col_names = self.db4e.list_collection_names()
-      for aCol in [ db_col, log_col, depl_col, metrics_col ]:
+      rt_col = self.rt_collection
+      for aCol in [ db_col, log_col, depl_col, metrics_col, rt_col ]:
          if aCol not in db_col_names:
             try:
-               self.db4e.create_collection(aCol)
-               if aCol == log_col:
-                  log_col = self.get_collection(log_col)
-                  log_col.create_index('timestamp')
+               if aCol == rt_col:
+                  self.db4e.create_collection(
+                     aCol, capped=True, max=self.rt_samples * RT_SERIES,
+                     size=self.rt_samples * RT_SERIES * RT_SAMPLE_SIZE)
+               elif aCol == metrics_col and self.metrics_timeseries:
+                  self.db4e.create_collection(aCol, timeseries=METRICS_TIMESERIES)
+               else:
+                  self.db4e.create_collection(aCol)
             except CollectionInvalid:
-               # TODO self.log.warning(f"Attempted to create existing collection: {aCol}")
-               pass
-            # TODO self.log.debug(f'Created DB collection ({aCol})')
-         self.ensure_indexes()
+               self.log.warning(f"Attempted to create existing collection: {aCol}")
+            except OperationFailure as e:
+               # MongoDB older than 5.0, keep the metrics in the mining collection
+               self.log.warning(f'Time-series collections not supported: {e}')
+               self.metrics_timeseries = False
+               self.db4e.create_collection(aCol)
+            self.log.debug(f'Created DB collection ({aCol})')
+      if self.metrics_timeseries:
+         self.init_timeseries()
+      self.ensure_indexes()
+      self.ensure_log_ttl()
+
+   def init_timeseries(self):
+      # The metrics collection was created before the time-series option was
+      # turned on. An empty one is recreated, otherwise the option is ignored.
+      metrics_col = self.metrics_collection
+      info = next(self.db4e.list_collections(filter={'name': metrics_col}))
+      if info.get('type') == 'timeseries':
+         return
+      if self.get_collection(metrics_col).estimated_document_count() == 0:
+         try:
+            self.db4e.drop_collection(metrics_col)
+            self.db4e.create_collection(metrics_col, timeseries=METRICS_TIMESERIES)
+            return
+         except OperationFailure as e:
+            self.log.warning(f'Time-series collections not supported: {e}')
+            self.db4e.create_collection(metrics_col)
+      self.log.warning(f'{metrics_col} is not a time-series collection, not using it')
+      self.metrics_timeseries = False
 
    def insert_one(self, col_name, jdoc):
       collection = self.get_collection(col_name)
       return collection.insert_one(jdoc)
+
+   def insert_many(self, col_name, jdocs):
+      collection = self.get_collection(col_name)
+      return collection.insert_many(jdocs)
+
+   def insert_uniq_by_timestamp(self, col_name, jdoc):
+      timestamp = jdoc['timestamp']
+      doc_type = jdoc['doc_type']
+      existing = self.find_one(col_name, {'doc_type': doc_type, 'timestamp': timestamp})
+      if not existing:
+         self.insert_one(col_name, jdoc)
+         return True
+      return False
    
-   def update_one(self, col_name, filter, new_values):
+   def is_online(self):
+      # As of the last connect attempt, doesn't touch the network
+      return is_online(self.ini)
+
+   def set_offline(self):
+      # An operation failed with a connection error
+      set_offline(self.ini)
+
+   def tail(self, col_name, filter):
+      # A tailable cursor on a capped collection, it blocks (briefly) waiting
+      # for new documents instead of returning at the end
+      col = self.get_collection(col_name)
+      return col.find(filter, cursor_type=CursorType.TAILABLE_AWAIT)
+
+   def watch(self, col_name, pipeline=None, **kwargs):
+      # A change stream, requires a replica set. The kwargs are passed on to
+      # Collection.watch(), e.g. full_document='updateLookup'.
+      col = self.get_collection(col_name)
+      return col.watch(pipeline, **kwargs)
+
+   def update_one(self, col_name, filter, new_values, upsert=False):
       collection = self.get_collection(col_name)
-      return collection.update_one(filter, {'$set' : new_values})
+      return collection.update_one(filter, {'$set' : new_values}, upsert=upsert)
+
+   def _plan_indexes(self, plan):
+      # Walk the plan stages, newer servers nest the classic plan in 'queryPlan'
+      if plan.get('stage') == 'COLLSCAN':
+         return ['COLLSCAN']
+      if 'indexName' in plan:
+         return [plan['indexName']]
+      indexes = []
+      for key in ('queryPlan', 'inputStage'):
+         if key in plan:
+            indexes += self._plan_indexes(plan[key])
+      for stage in plan.get('inputStages', []):
+         indexes += self._plan_indexes(stage)
+      return indexes
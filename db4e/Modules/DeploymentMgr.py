@@ -8,21 +8,43 @@ db4e/Modules/DeploymentManager.py
 """
 
 import os, shutil
+import json
 from datetime import datetime, timezone
 import getpass
+import threading
+from pymongo.errors import ConnectionFailure, PyMongoError
 
 from db4e.Modules.ConfigMgr import Config
 from db4e.Modules.DbMgr import DbMgr
+from db4e.Modules.Db4eLogger import Db4eLogger
 
 # The Mongo collection that houses the deployment records
 DEPL_COL = 'depl'
 
+# Copy of the deployment records that were last read from MongoDB, used
+# while MongoDB isn't reachable. See the 'depl_snapshot' setting.
+SNAPSHOT_FILE = os.path.join('~', '.cache', 'db4e', 'deployments.json')
+
 class DeploymentMgr:
+
+   # Deployment records by (component, instance), None if there's no record.
+   # Shared by all DeploymentMgr instances in the process, so a write through
+   # one of them (e.g. the InstallMgr's) invalidates the others too.
+   _cache = {}
+   _cache_lock = threading.Lock()
+   # Snapshot file -> its records, read once. The file is only rewritten
+   # when a record changed.
+   _snapshots = {}
+   _snapshot_lock = threading.Lock()
+   _watching = False
     
    def __init__(self, config: Config):
       self.ini = config
       self.db = DbMgr(config)
       self.col_name = DEPL_COL
+      snapshot_file = self.ini.config.get('db4e', {}).get('depl_snapshot', SNAPSHOT_FILE)
+      self.snapshot_file = os.path.expanduser(snapshot_file)
+      self.log = Db4eLogger('DeploymentMgr', config)
 
    def add_deployment(self, rec):
       rec['doc_type'] = 'deployment'
@@ -33,18 +55,28 @@ class DeploymentMgr:
       else:
          rec['version'] = self.ini.config[rec['component']]['version']
       self.db.insert_one(self.col_name, rec)
+      self.invalidate()
+
+   def delete_deployment_instance(self, component, instance):
+      filter = {'doc_type': 'deployment', 'component': component, 'instance': instance}
+      self.db.delete_one(self.col_name, filter)
+      self.invalidate()
+
+   def invalidate(self):
+      with self._cache_lock:
+         DeploymentMgr._cache = {}
 
    def is_initialized(self):
-      rec = self.db.find_one(self.col_name, {'doc_type': 'deployment', 'component': 'db4e'})
+      rec = self._find('db4e')
       if rec:
          return True
       else:
          return False
 
    def get_deployment(self, component):
-      print(f"DeploymentMgr:get_deployment(): {component}")
+      self.log.debug(f'get_deployment(): {component}')
       # Ask the db for the component record
-      db_rec = self.db.find_one(self.col_name, {'doc_type': 'deployment', 'component': component})
+      db_rec = self._find(component)
       # rec is a cursor object.
       if db_rec:
          rec = {}
@@ -59,10 +91,15 @@ class DeploymentMgr:
       # No record for this deployment exists
 
       # Check if this is the first time the app has been run
-      rec = self.db.find_one(self.col_name, {'doc_type': 'deployment', 'component': 'db4e'})
+      rec = self._find('db4e')
       if not rec:
          return False
         
+   def get_deployments(self, components):
+      # All of the deployment records of the components, straight from the db
+      filter = {'doc_type': 'deployment', 'component': {'$in': list(components)}}
+      return list(self.db.find_many(self.col_name, filter))
+
    def get_deployment_by_instance(self, component, instance):
       if instance == 'db4e core':
          return self.get_deployment('db4e')
@@ -71,4 +108,94 @@ class DeploymentMgr:
       component = rec['component']
       if component == 'db4e':
          filter = {'doc_type': 'deployment', 'component': 'db4e'}
-         self.db.update_one(self.col_name, filter, rec)
\ No newline at end of file
+         self.db.update_one(self.col_name, filter, rec)
+      self.invalidate()
+
+   def update_deployment_instance(self, component, instance, new_values):
+      filter = {'doc_type': 'deployment', 'component': component, 'instance': instance}
+      new_values['updated'] = datetime.now(timezone.utc)
+      self.db.update_one(self.col_name, filter, new_values)
+      self.invalidate()
+
+   def watch(self):
+      # Keep the cache coherent with changes made by other processes, e.g.
+      # the db4e service. One watcher thread per process.
+      with self._cache_lock:
+         if DeploymentMgr._watching:
+            return
+         DeploymentMgr._watching = True
+      threading.Thread(target=self._watch, name='DeploymentMgr.watch', daemon=True).start()
+
+   def _find(self, component, instance=None):
+      key = (component, instance)
+      cache = DeploymentMgr._cache
+      if key in cache:
+         return cache[key]
+      if not self.db.connect():
+         # Offline, the records aren't cached so they're read from MongoDB
+         # once it's back
+         return self._load_snapshot().get(self._snapshot_key(key))
+      filter = {'doc_type': 'deployment', 'component': component}
+      if instance:
+         filter['instance'] = instance
+      try:
+         rec = self.db.find_one(self.col_name, filter)
+      except ConnectionFailure as e:
+         self.log.warning(f'Lost the connection to MongoDB, running offline: {e}')
+         self.db.set_offline()
+         return self._load_snapshot().get(self._snapshot_key(key))
+      cache[key] = rec
+      self._save_snapshot(key, rec)
+      return rec
+
+   def _load_snapshot(self):
+      with self._snapshot_lock:
+         return self._get_snapshot()
+
+   def _get_snapshot(self):
+      # Called with the _snapshot_lock held
+      snapshot = DeploymentMgr._snapshots.get(self.snapshot_file)
+      if snapshot is None:
+         try:
+            with open(self.snapshot_file, 'r') as f:
+               snapshot = json.load(f)
+         except (OSError, ValueError):
+            snapshot = {}
+         DeploymentMgr._snapshots[self.snapshot_file] = snapshot
+      return snapshot
+
+   def _save_snapshot(self, key, rec):
+      snapshot_key = self._snapshot_key(key)
+      if rec:
+         # As it reads back from the JSON file, e.g. the datetimes as strings
+         rec = json.loads(json.dumps(
+            { name: value for name, value in rec.items() if name != '_id' }, default=str))
+      with self._snapshot_lock:
+         snapshot = self._get_snapshot()
+         if snapshot_key in snapshot and snapshot[snapshot_key] == rec:
+            # Unchanged
+            return
+         snapshot[snapshot_key] = rec
+         try:
+            os.makedirs(os.path.dirname(self.snapshot_file), exist_ok=True)
+            tmp_file = self.snapshot_file + '.tmp'
+            with open(tmp_file, 'w') as f:
+               json.dump(snapshot, f, default=str)
+            os.replace(tmp_file, self.snapshot_file)
+         except OSError as e:
+            self.log.warning(f'Unable to save the deployment snapshot ({self.snapshot_file}): {e}')
+
+   def _snapshot_key(self, key):
+      component, instance = key
+      return f'{component}/{instance or ""}'
+
+   def _watch(self):
+      try:
+         with self.db.watch(self.col_name) as stream:
+            for change in stream:
+               self.invalidate()
+      except PyMongoError as e:
+         # Change streams need a replica set, only our own writes invalidate the cache
+         self.log.info(f'Not watching the deployment records: {e}')
+         with self._cache_lock:
+            DeploymentMgr._watching = False
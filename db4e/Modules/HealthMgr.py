@@ -0,0 +1,112 @@
+"""
+db4e/Modules/HealthMgr.py
+
+   Database 4 Everything
+   Author: Nadim-Daniel Ghaznavi
+   Copyright (c) 2024-2025 NadimGhaznavi <https://github.com/NadimGhaznavi/db4e>
+   License: GPL 3.0
+
+Health checks for the deployments. All of the probes of a deployment
+(systemd service, directories, TCP ports) run concurrently, each with its
+own timeout, and the results are yielded as they come in. An unreachable
+remote monerod only holds up its own port probes. The results are cached
+for a few seconds, so flipping between the screens doesn't probe again.
+"""
+
+import os
+import time
+import asyncio
+
+from db4e.Modules.ConfigMgr import Config
+from db4e.Modules.SystemdMgr import SystemdMgr
+
+# Seconds before a probe is given up on, and how long a result is cached
+PROBE_TIMEOUT = 2
+CACHE_TTL = 5
+
+GOOD = 'good'
+WARNING = 'warning'
+
+
+class HealthMgr:
+
+    def __init__(self, config: Config, probe_timeout: float = PROBE_TIMEOUT, cache_ttl: float = CACHE_TTL):
+        self.ini = config
+        self.systemd = SystemdMgr(config)
+        self.probe_timeout = probe_timeout
+        self.cache_ttl = cache_ttl
+        # (probe type, args) -> (time.monotonic(), result)
+        self._cache = {}
+
+    async def check(self, depl):
+        # Yields (probe name, result) pairs in the order the probes finish
+        tasks = [ asyncio.create_task(self._run_probe(name, probe))
+                  for name, probe in self.get_probes(depl).items() ]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                yield await next_done
+        finally:
+            # E.g. the user navigated away
+            for task in tasks:
+                task.cancel()
+
+    async def check_all(self, depl):
+        # Probe name -> result, once all of the probes are done
+        return { name: result async for name, result in self.check(depl) }
+
+    def get_probes(self, depl):
+        # Probe name -> (probe type, args)
+        component = depl.get('component', 'db4e')
+        instance = depl.get('instance')
+        probes = {}
+        if component == 'db4e':
+            probes['Service'] = ('service', 'db4e')
+            probes['Install Directory'] = ('dir', depl.get('install_dir'))
+            probes['Deployment Directory'] = ('dir', depl.get('vendor_dir'))
+        elif component == 'monerod':
+            probes['RPC Port'] = ('port', depl.get('ip_addr'), depl.get('rpc_bind_port'))
+            probes['ZMQ Port'] = ('port', depl.get('ip_addr'), depl.get('zmq_pub_port'))
+        elif component == 'p2pool':
+            probes['Stratum Port'] = ('port', depl.get('ip_addr'), depl.get('stratum_port'))
+        if component in ('monerod', 'p2pool', 'xmrig') and not depl.get('remote'):
+            probes['Service'] = ('service', f'{component}@{instance}')
+        return probes
+
+    def invalidate(self):
+        self._cache = {}
+
+    async def probe_dir(self, path):
+        if not path:
+            return {'state': WARNING, 'msg': 'Not set'}
+        if await asyncio.to_thread(os.path.isdir, path):
+            return {'state': GOOD, 'msg': path}
+        return {'state': WARNING, 'msg': f'{path} does not exist'}
+
+    async def probe_port(self, ip_addr, port):
+        try:
+            _, writer = await asyncio.open_connection(ip_addr, port)
+        except OSError as e:
+            return {'state': WARNING, 'msg': f'Unable to connect to {ip_addr}:{port} ({e.strerror or e})'}
+        writer.close()
+        return {'state': GOOD, 'msg': f'Connected to {ip_addr}:{port}'}
+
+    async def probe_service(self, unit):
+        # One systemctl call per tick for all of the units, see SystemdMgr
+        state = await asyncio.to_thread(self.systemd.status, unit)
+        if not state.installed:
+            return {'state': WARNING, 'msg': f'The {unit} service is not installed'}
+        if not state.active:
+            return {'state': WARNING, 'msg': f'The {unit} service is stopped'}
+        return {'state': GOOD, 'msg': f'The {unit} service is running, PID ({state.pid})'}
+
+    async def _run_probe(self, name, probe):
+        cached = self._cache.get(probe)
+        if cached and time.monotonic() - cached[0] < self.cache_ttl:
+            return name, cached[1]
+        probe_type, *args = probe
+        try:
+            result = await asyncio.wait_for(getattr(self, f'probe_{probe_type}')(*args), self.probe_timeout)
+        except asyncio.TimeoutError:
+            result = {'state': WARNING, 'msg': f'No answer within {self.probe_timeout} seconds'}
+        self._cache[probe] = (time.monotonic(), result)
+        return name, result
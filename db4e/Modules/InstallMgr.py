@@ -5,85 +5,284 @@ db4e/Modules/InstallMgr.py
    Author: Nadim-Daniel Ghaznavi 
    Copyright (c) 2024-2025 NadimGhaznavi <https://github.com/NadimGhaznavi/db4e>
    License: GPL 3.0
+
+The initial setup is a staged pipeline: the directories are created, then
+the systemd units are rendered and the binaries are copied in parallel,
+in a thread pool, and finally the installer script is run. The results are
+reported step by step as they come in. The binaries are copied in the
+kernel (reflink, copy_file_range() or sendfile()), files that are already
+in place are skipped, so an interrupted install can be resumed.
 """
 
 import os, shutil
 from datetime import datetime, timezone
 import getpass
 import subprocess
+import asyncio
+import fcntl
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
+from pymongo.errors import PyMongoError
 
+from db4e.Modules.AsyncDbMgr import AsyncDbMgr
 from db4e.Modules.ConfigMgr import Config
-from db4e.Modules.DbMgr import DbMgr
 from db4e.Modules.DeploymentMgr import DeploymentMgr
+from db4e.Modules.TemplateRenderer import render_units
+
+# Files that are staged at the same time
+STAGING_WORKERS = 4
+# Present in the deployment directory while the files are being staged, an
+# install that was interrupted is resumed instead of backed up
+STAGING_MARKER = '.db4e-staging'
+# Block size for the checksums
+CHECKSUM_BLOCK = 1024 * 1024
+# ioctl to share the blocks of a file (btrfs, xfs), see linux/fs.h
+FICLONE = 0x40049409
+
+
+def copy_file(src, dst):
+    # Copy src to dst, unless dst already has the same contents. The copy is
+    # written to a temporary file first, so an interrupted copy never looks
+    # complete. Returns how the file was copied.
+    if os.path.exists(dst) and os.path.getsize(dst) == os.path.getsize(src) \
+            and file_checksum(dst) == file_checksum(src):
+        return 'unchanged'
+    part_file = dst + '.part'
+    with open(src, 'rb') as fsrc, open(part_file, 'wb') as fdst:
+        method = _copy_fd(fsrc.fileno(), fdst.fileno(), os.fstat(fsrc.fileno()).st_size)
+    shutil.copymode(src, part_file)
+    os.replace(part_file, dst)
+    return method
 
-# The Mongo collection that houses the deployment records
-DEPL_COL = 'depl'
+def file_checksum(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(CHECKSUM_BLOCK), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+def _copy_fd(src_fd, dst_fd, size):
+    # Reflink where the filesystem supports it, otherwise the data is copied
+    # in the kernel and never passes through Python
+    try:
+        fcntl.ioctl(dst_fd, FICLONE, src_fd)
+        return 'reflink'
+    except OSError:
+        pass
+    for method in ('copy_file_range', 'sendfile'):
+        os.lseek(src_fd, 0, os.SEEK_SET)
+        os.lseek(dst_fd, 0, os.SEEK_SET)
+        os.ftruncate(dst_fd, 0)
+        offset = 0
+        try:
+            while offset < size:
+                if method == 'copy_file_range':
+                    num_bytes = os.copy_file_range(src_fd, dst_fd, size - offset)
+                else:
+                    num_bytes = os.sendfile(dst_fd, src_fd, offset, size - offset)
+                    os.lseek(dst_fd, offset + num_bytes, os.SEEK_SET)
+                if num_bytes == 0:
+                    break
+                offset += num_bytes
+        except (OSError, AttributeError):
+            # E.g. copy_file_range() across filesystems on older kernels
+            continue
+        if offset == size:
+            return method
+    os.lseek(src_fd, 0, os.SEEK_SET)
+    os.lseek(dst_fd, 0, os.SEEK_SET)
+    os.ftruncate(dst_fd, 0)
+    with open(src_fd, 'rb', closefd=False) as fsrc, open(dst_fd, 'wb', closefd=False) as fdst:
+        shutil.copyfileobj(fsrc, fdst)
+    return 'read/write'
 
 class InstallMgr:
 
     def __init__(self, config: Config):
         self.ini = config
         self.depl_mgr = DeploymentMgr(config)
-        self.db = DbMgr(config)
+        # The deployment records are read and written off the event loop,
+        # through the DeploymentMgr's DbMgr
+        self.adb = AsyncDbMgr(self.depl_mgr.db)
 
-    async def initial_setup(self, form_data: dict) -> dict:
-        # Track the progress of the initial install
+    async def initial_setup(self, form_data: dict, progress=None) -> list:
+        # Track the progress of the initial install, progress() is called
+        # with each result as it comes in
         results = []
+        def report(result):
+            results.append(result)
+            if progress:
+                progress(result)
+
         # Validate the data
         user_wallet = form_data['user_wallet']
         db4e_group = form_data['db4e_group']
         vendor_dir = form_data['vendor_dir']
 
-        db4e_rec = self.depl_mgr.get_deployment('db4e')
-        if db4e_rec:
-            # The Mongo record for 'db4e' exists: Assume we're doing a reinstall
-            results.append({'Db4E core': {'status': 'warn', 'msg': 'Db4E core already exists'}})
-            old_user_wallet = db4e_rec['user_wallet']
-            old_group = db4e_rec['group']
-            old_vendor_dir = db4e_rec['vendor_dir']
+        try:
+            db4e_rec = await self.adb.call(self.depl_mgr.get_deployment, 'db4e')
+            if db4e_rec:
+                # The Mongo record for 'db4e' exists: Assume we're doing a reinstall
+                report({'Db4E core': {'status': 'warn', 'msg': 'Db4E core already exists'}})
+                old_user_wallet = db4e_rec['user_wallet']
+                old_group = db4e_rec['group']
+                old_vendor_dir = db4e_rec['vendor_dir']
 
-            if user_wallet != old_user_wallet:
-                results.append({'Monero wallet': {'status': 'warn', 'msg': 'Old Monero wallet record'}})
+                if user_wallet != old_user_wallet:
+                    report({'Monero wallet': {'status': 'warn', 'msg': 'Old Monero wallet record'}})
+                    db4e_rec['user_wallet'] = user_wallet
+                    await self.adb.call(self.depl_mgr.update_deployent, db4e_rec)
+                    report({'Monero wallet': {'status': 'good', 'msg': 'Updated Monero wallet'}})
+                if db4e_group != old_group:
+                    report({'Db4E Group': {'status':'warn', 'msg': f'Old Db4E group ({old_group}) record'}})
+                    os.environ['DB4E_OLD_GROUP'] = old_group
+                if vendor_dir != old_vendor_dir:
+                    report({'Deployment directory': {'status':'warn', 'msg': f'Old deployment directory ({old_vendor_dir}) record'}})
+            else:
+                db4e_rec = self.depl_mgr.db.get_new_rec('db4e')
                 db4e_rec['user_wallet'] = user_wallet
-                self.depl_mgr.update_deployent(db4e_rec)
-                results.append({'Monero wallet': {'status': 'good', 'msg': 'Updated Monero wallet'}})
-            if db4e_group != old_group:
-                results.append({'Db4E Group': {'status':'warn', 'msg': f'Old Db4E group ({old_group}) record'}})
-                os.environ['DB4E_OLD_GROUP'] = old_group
-            if vendor_dir != old_vendor_dir:
-                results.append({'Deployment directory': {'status':'warn', 'msg': f'Old deployment directory ({old_vendor_dir}) record'}})
+                await self.adb.call(self.depl_mgr.add_deployment, db4e_rec)
+        except (asyncio.TimeoutError, PyMongoError) as e:
+            report({'Db4E core': {'status': 'error', 'msg': f'Unable to access the deployment records: {e}'}})
+            return results # Abort the install
+
+        # Create the vendor directory, or resume an install that was interrupted
+        staging_marker = os.path.join(vendor_dir, STAGING_MARKER)
+        if os.path.exists(staging_marker):
+            report({'Deployment directory': {'status': 'warn', 'msg': f'Resuming the interrupted install ({vendor_dir})'}})
         else:
-            db4e_rec = self.db.get_new_rec('db4e')
-            db4e_rec['user_wallet'] = user_wallet
-            self.depl_mgr.add_deployment(db4e_rec)
-
-        # Create the vendor directory
-        if os.path.exists(vendor_dir):
-            results.append({'Deployment directory': {'status':'warn', 'msg': f'Found existing deployment directory ({vendor_dir})'}})
-            timestamp = datetime.now().strftime("%Y-%m-%d_%H:%M:%S")
+            if os.path.exists(vendor_dir):
+                report({'Deployment directory': {'status':'warn', 'msg': f'Found existing deployment directory ({vendor_dir})'}})
+                timestamp = datetime.now().strftime("%Y-%m-%d_%H:%M:%S")
+                try:
+                    backup_vendor_dir = vendor_dir + '.' + timestamp
+                    os.rename(vendor_dir, backup_vendor_dir)
+                    report({'Deployment directory': {'status': 'warn', 'msg': f'Backed up old deployment directory ({backup_vendor_dir})'}})
+                except PermissionError:
+                    report({'Deployment directory': {'status': 'error', 'msg': f'Failed to backup old deployment directory ({backup_vendor_dir})'}})
+                    return results # Abort the install
             try:
-                backup_vendor_dir = vendor_dir + '.' + timestamp
-                os.rename(vendor_dir, backup_vendor_dir)
-                results.append({'Deployment directory': {'status': 'warn', 'msg': f'Backed up old deployment directory ({backup_vendor_dir})'}})
-            except PermissionError:
-                results.append({'Deployment directory': {'status': 'error', 'msg': f'Failed to backup old deployment directory ({backup_vendor_dir})'}})
+                os.mkdir(vendor_dir)
+                open(staging_marker, 'w').close()
+            except (PermissionError, FileNotFoundError, FileExistsError) as e:
+                error_msg = f'Failed to create directory ({vendor_dir}). Make sure you '
+                error_msg += 'have permission to create the directory and that the parent '
+                error_msg += 'directory exists\n\n'
+                error_msg += f'{e}'
+                report({'Deployment directory': {'status': 'error', 'msg': error_msg}})
                 return results # Abort the install
+
+        # Additional config settings
+        bin_dir              = self.ini.config['db4e']['bin_dir']
+        db4e_dir             = self.ini.config['db4e']['db4e_dir']
+        initial_setup_script = self.ini.config['db4e']['setup_script']
+
+        # The db4e user (the account used to run Db4E)
+        db4e_user = getpass.getuser()
+
+        # Temp directory to house the systemd service files
+        tmp_dir = os.path.join('/tmp', 'db4e')
+
+        # Stage 1: The vendor directories and an empty temp directory
+        dirs, units, steps = self.staging_plan(vendor_dir, db4e_user, db4e_group)
         try:
-            os.mkdir(vendor_dir)
-        except (PermissionError, FileNotFoundError, FileExistsError) as e:
-            error_msg = f'Failed to create directory ({vendor_dir}). Make sure you '
-            error_msg += 'have permission to create the directory and that the parent '
-            error_msg += 'directory exists\n\n'
-            error_msg += f'{e}'
-            results.append({'Deployment directory': {'status': 'error', 'msg': error_msg}})
+            await asyncio.to_thread(self.make_dirs, dirs, tmp_dir)
+        except OSError as e:
+            report({'Deployment directory': {'status': 'error', 'msg': f'Failed to create the directories: {e}'}})
             return results # Abort the install
+        report({'Deployment directory': {'status': 'good', 'msg': f'Created the directories in {vendor_dir}'}})
 
-        # Additional config settings
+        # Stage 2: The systemd units (all in one pass) and the binaries and
+        # start-scripts, in parallel
+        failed = False
+        loop = asyncio.get_running_loop()
+        with ThreadPoolExecutor(max_workers=STAGING_WORKERS, thread_name_prefix='InstallMgr') as pool:
+            jobs = [ loop.run_in_executor(pool, self.render_step, units, tmp_dir) ]
+            jobs += [ loop.run_in_executor(pool, self.run_step, *step) for step in steps ]
+            for job in asyncio.as_completed(jobs):
+                result = await job
+                failed = failed or any(msg['status'] == 'error' for msg in result.values())
+                report(result)
+        if failed:
+            return results # Abort the install, it can be resumed
+
+        # Stage 3: Run the bin/db4e-installer.sh
+        db4e_install_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+        fq_initial_setup = os.path.join(db4e_install_dir, bin_dir, initial_setup_script)
+        try:
+            cmd_result = await asyncio.to_thread(
+                subprocess.run,
+                ['sudo', fq_initial_setup, db4e_dir, db4e_user, db4e_group, vendor_dir],
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+                input=b"",
+                timeout=10)
+            stdout = cmd_result.stdout.decode().strip()
+            stderr = cmd_result.stderr.decode().strip()
+
+            # Check the return code
+            if cmd_result.returncode != 0:
+                report({'Db4E core': {'status': 'error', 'msg': f'Service install failed.\n\n{stderr}'}})
+                return results
+            
+            installer_output = f'{stdout}'
+            report({'Db4E core': {'status': 'good', 'msg': installer_output}})
+            # Installed, a failed installer run leaves the marker so it's resumed
+            await asyncio.to_thread(self.finish_staging, staging_marker, tmp_dir)
+
+        except Exception as e:
+            report({'Db4E core': {'status': 'error', 'msg': f'Fatal error: {e}'}})
+
+        # Build the db4e deployment record
+        db4e_rec['enable'] = True
+        db4e_rec['group'] = db4e_group
+        db4e_rec['install_dir'] = db4e_install_dir
+        db4e_rec['user'] = db4e_user
+        db4e_rec['vendor_dir'] = vendor_dir
+        # Update the repo deployment record
+        try:
+            await self.adb.call(self.depl_mgr.update_deployent, db4e_rec)
+        except (asyncio.TimeoutError, PyMongoError) as e:
+            report({'Db4E core': {'status': 'error', 'msg': f'Unable to save the deployment record: {e}'}})
+        return results
+
+    def finish_staging(self, staging_marker, tmp_dir):
+        os.remove(staging_marker)
+        shutil.rmtree(tmp_dir)
+
+    def make_dirs(self, dirs, tmp_dir):
+        # Parents first, existing directories are fine (resumed install). The
+        # temp directory is emptied, it only gets the units that changed.
+        if os.path.exists(tmp_dir):
+            shutil.rmtree(tmp_dir)
+        os.mkdir(tmp_dir)
+        for fq_dir in dirs:
+            os.makedirs(fq_dir, exist_ok=True)
+
+    def render_step(self, units, tmp_dir):
+        # Only the units that changed end up in tmp_dir, the installer skips
+        # the daemon-reload if there are none
+        try:
+            return render_units(units, tmp_dir)
+        except OSError as e:
+            return {'Systemd units': {'status': 'error', 'msg': f'{e}'}}
+
+    def run_step(self, name, func, *args):
+        # A stage 2 file copy, run in the thread pool
+        try:
+            method = func(*args)
+        except OSError as e:
+            return {name: {'status': 'error', 'msg': f'{e}'}}
+        if method == 'unchanged':
+            return {name: {'status': 'good', 'msg': 'Already in place'}}
+        return {name: {'status': 'good', 'msg': f'Installed ({method})'}}
+
+    def staging_plan(self, vendor_dir, db4e_user, db4e_group):
+        # The directories to create, the (template, values) systemd units and
+        # the (name, function, *args) file copy steps
         bin_dir              = self.ini.config['db4e']['bin_dir']
         conf_dir             = self.ini.config['db4e']['conf_dir']
-        db4e_dir             = self.ini.config['db4e']['db4e_dir']
         db4e_service_file    = self.ini.config['db4e']['service_file']
-        initial_setup_script = self.ini.config['db4e']['setup_script']
         log_dir              = self.ini.config['db4e']['log_dir']
         run_dir              = self.ini.config['db4e']['run_dir']
         systemd_dir          = self.ini.config['db4e']['systemd_dir']
@@ -103,170 +302,60 @@ class InstallMgr:
         xmrig_service_file   = self.ini.config['xmrig']['service_file'] 
         xmrig_version        = self.ini.config['xmrig']['version']
 
-        # The db4e user (the account used to run Db4E)
-        db4e_user = getpass.getuser()
-
         # db4e, P2Pool, Monero daemon and XMRig directories
         db4e_vendor_dir = 'db4e'
         p2pool_dir = 'p2pool-' + str(p2pool_version)
         monerod_dir = 'monerod-' + str(monerod_version)
         xmrig_dir = 'xmrig-' + str(xmrig_version)
 
-        # Create the vendor directories
-        os.mkdir(os.path.join(vendor_dir, blockchain_dir))
-        os.mkdir(os.path.join(vendor_dir, db4e_vendor_dir))
-        os.mkdir(os.path.join(vendor_dir, db4e_vendor_dir, conf_dir))
-        os.mkdir(os.path.join(vendor_dir, p2pool_dir))
-        os.mkdir(os.path.join(vendor_dir, p2pool_dir, bin_dir))
-        os.mkdir(os.path.join(vendor_dir, p2pool_dir, conf_dir))
-        os.mkdir(os.path.join(vendor_dir, p2pool_dir, run_dir))
-        os.mkdir(os.path.join(vendor_dir, monerod_dir))
-        os.mkdir(os.path.join(vendor_dir, monerod_dir, bin_dir))
-        os.mkdir(os.path.join(vendor_dir, monerod_dir, conf_dir))
-        os.mkdir(os.path.join(vendor_dir, monerod_dir, run_dir))
-        os.mkdir(os.path.join(vendor_dir, monerod_dir, log_dir))
-        os.mkdir(os.path.join(vendor_dir, xmrig_dir))
-        os.mkdir(os.path.join(vendor_dir, xmrig_dir, bin_dir))
-        os.mkdir(os.path.join(vendor_dir, xmrig_dir, conf_dir))
+        # The vendor directories
+        dirs = [
+            os.path.join(vendor_dir, blockchain_dir),
+            os.path.join(vendor_dir, db4e_vendor_dir, conf_dir),
+            os.path.join(vendor_dir, p2pool_dir, bin_dir),
+            os.path.join(vendor_dir, p2pool_dir, conf_dir),
+            os.path.join(vendor_dir, p2pool_dir, run_dir),
+            os.path.join(vendor_dir, monerod_dir, bin_dir),
+            os.path.join(vendor_dir, monerod_dir, conf_dir),
+            os.path.join(vendor_dir, monerod_dir, run_dir),
+            os.path.join(vendor_dir, monerod_dir, log_dir),
+            os.path.join(vendor_dir, xmrig_dir, bin_dir),
+            os.path.join(vendor_dir, xmrig_dir, conf_dir),
+        ]
 
         # The Templates directory
         tmpl_dir = os.path.join(os.path.dirname(__file__), '..', templates_dir)
         # Fully qualifed directories
-        fq_db4e_dir = os.path.join(vendor_dir, db4e_vendor_dir)
         fq_p2pool_dir = os.path.join(vendor_dir, p2pool_dir)
         fq_monerod_dir = os.path.join(vendor_dir, monerod_dir)
         fq_xmrig_dir = os.path.join(vendor_dir, xmrig_dir)
 
-        # Templates for the db4e, Monero daemon and P2pool services
-        fq_db4e_service_file    = os.path.join(tmpl_dir, 'db4e', systemd_dir, db4e_service_file)
-        fq_p2pool_service_file  = os.path.join(tmpl_dir, p2pool_dir, systemd_dir, p2pool_service_file)
-        fq_p2pool_socket_file   = os.path.join(tmpl_dir, p2pool_dir, systemd_dir, p2pool_socket_file)
-        fq_monerod_service_file = os.path.join(tmpl_dir, monerod_dir, systemd_dir, monerod_service_file)
-        fq_monerod_socket_file  = os.path.join(tmpl_dir, monerod_dir, systemd_dir, monerod_socket_file)
-        fq_xmrig_service_file   = os.path.join(tmpl_dir, xmrig_dir, systemd_dir, xmrig_service_file)
-
-        # P2Pool, Monerod daemon, XMRig binaries and start-scripts
-        fq_p2pool               = os.path.join(tmpl_dir, p2pool_dir, bin_dir, p2pool_binary)
-        fq_p2pool_start_script  = os.path.join(tmpl_dir, p2pool_dir, bin_dir, p2pool_start_script)
-        fq_monerod              = os.path.join(tmpl_dir, monerod_dir, bin_dir, monerod_binary)
-        fq_monerod_start_script = os.path.join(tmpl_dir, monerod_dir, bin_dir, monerod_start_script)
-        fq_xmrig                = os.path.join(tmpl_dir, xmrig_dir, bin_dir, xmrig_binary)
-
-        # Temp directory to house the systemd service files
-        tmp_dir = os.path.join('/tmp', 'db4e')
-        if os.path.exists(tmp_dir):
-            shutil.rmtree(tmp_dir)
-        os.mkdir(tmp_dir)
-
-        # Update the db4e service template with deployment values
-        fq_db4e_dir = os.path.join(vendor_dir, )
-        placeholders = {
-            'DB4E_USER': db4e_user,
-            'DB4E_GROUP': db4e_group,
-            'DB4E_DIR': fq_db4e_dir,
-        }
-        with open(fq_db4e_service_file, 'r') as f:
-            service_contents = f.read()
-            for key, val in placeholders.items():
-                service_contents = service_contents.replace(f'[[{key}]]', str(val))
-        tmp_service_file = os.path.join(tmp_dir, db4e_service_file)
-        with open(tmp_service_file, 'w') as f:
-            f.write(service_contents)
-
-        # Update the P2Pool service templates with deployment values
-        placeholders = {
-            'P2POOL_DIR': fq_p2pool_dir,
-            'DB4E_USER': db4e_user,
-            'DB4E_GROUP': db4e_group,
-        }
-        with open(fq_p2pool_service_file, 'r') as f:
-            service_contents = f.read()
-            for key, val in placeholders.items():
-                service_contents = service_contents.replace(f'[[{key}]]', str(val))
-        tmp_service_file = os.path.join(tmp_dir, p2pool_service_file)
-        with open(tmp_service_file, 'w') as f:
-            f.write(service_contents)
-        with open(fq_p2pool_socket_file, 'r') as f:
-            service_contents = f.read()
-            for key, val in placeholders.items():
-                service_contents = service_contents.replace(f'[[{key}]]', str(val))
-        tmp_service_file = os.path.join(tmp_dir, p2pool_socket_file)
-        with open(tmp_service_file, 'w') as f:
-            f.write(service_contents)
-
-        # Update the Monero daemon service templates with deployment values
-        placeholders = {
-            'MONEROD_DIR': fq_monerod_dir,
-            'DB4E_USER': db4e_user,
-            'DB4E_GROUP': db4e_group,
-        }
-        with open(fq_monerod_service_file, 'r') as f:
-            service_contents = f.read()
-            for key, val in placeholders.items():
-                service_contents = service_contents.replace(f'[[{key}]]', str(val))
-        tmp_service_file = os.path.join(tmp_dir, monerod_service_file)
-        with open(tmp_service_file, 'w') as f:
-            f.write(service_contents)
-        with open(fq_monerod_socket_file, 'r') as f:
-            service_contents = f.read()
-            for key, val in placeholders.items():
-                service_contents = service_contents.replace(f'[[{key}]]', str(val))
-        tmp_service_file = os.path.join(tmp_dir, monerod_socket_file)
-        with open(tmp_service_file, 'w') as f:
-            f.write(service_contents)
-
-        # Update the XMRig miner service template with deployment values
-        placeholders = {
-            'XMRIG_DIR': fq_xmrig_dir,
-            'DB4E_USER': db4e_user,
-            'DB4E_GROUP': db4e_group,
-        }
-        with open(fq_xmrig_service_file, 'r') as f:
-            service_contents = f.read()
-            for key, val in placeholders.items():
-                service_contents = service_contents.replace(f'[[{key}]]', str(val))
-        tmp_service_file = os.path.join(tmp_dir, xmrig_service_file)
-        with open(tmp_service_file, 'w') as f:
-            f.write(service_contents)
-
-        # Copy in the Monero daemon, P2Pool and XMRig binaries and startup scripts
-        shutil.copy(fq_p2pool, os.path.join(vendor_dir, p2pool_dir, bin_dir))
-        shutil.copy(fq_p2pool_start_script, os.path.join(vendor_dir, p2pool_dir, bin_dir))
-        shutil.copy(fq_monerod, os.path.join(vendor_dir, monerod_dir, bin_dir))
-        shutil.copy(fq_monerod_start_script, os.path.join(vendor_dir, monerod_dir, bin_dir))
-        shutil.copy(fq_xmrig, os.path.join(vendor_dir, xmrig_dir, bin_dir))
-
-        # Run the bin/db4e-installer.sh
-        db4e_install_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
-        fq_initial_setup = os.path.join(db4e_install_dir, bin_dir, initial_setup_script)
-        try:
-            cmd_result = subprocess.run(
-                ['sudo', fq_initial_setup, db4e_dir, db4e_user, db4e_group, vendor_dir],
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                input=b"",
-                timeout=10)
-            stdout = cmd_result.stdout.decode().strip()
-            stderr = cmd_result.stderr.decode().strip()
-
-            # Check the return code
-            if cmd_result.returncode != 0:
-                results.append({'Db4E core': {'status': 'error', 'msg': f'Service install failed.\n\n{stderr}'}})
-                return results
-            
-            installer_output = f'{stdout}'
-            results.append({'Db4E core': {'status': 'good', 'msg': installer_output}})
-            shutil.rmtree(tmp_dir)
-
-        except Exception as e:
-            results.append({'Db4E core': {'status': 'error', 'msg': f'Fatal error: {e}'}})
+        # The values for the systemd unit templates
+        common = {'DB4E_USER': db4e_user, 'DB4E_GROUP': db4e_group}
+        db4e_placeholders = dict(common, DB4E_DIR=vendor_dir)
+        p2pool_placeholders = dict(common, P2POOL_DIR=fq_p2pool_dir)
+        monerod_placeholders = dict(common, MONEROD_DIR=fq_monerod_dir)
+        xmrig_placeholders = dict(common, XMRIG_DIR=fq_xmrig_dir)
+        units = [
+            (os.path.join(tmpl_dir, db4e_vendor_dir, systemd_dir, db4e_service_file), db4e_placeholders),
+            (os.path.join(tmpl_dir, p2pool_dir, systemd_dir, p2pool_service_file), p2pool_placeholders),
+            (os.path.join(tmpl_dir, p2pool_dir, systemd_dir, p2pool_socket_file), p2pool_placeholders),
+            (os.path.join(tmpl_dir, monerod_dir, systemd_dir, monerod_service_file), monerod_placeholders),
+            (os.path.join(tmpl_dir, monerod_dir, systemd_dir, monerod_socket_file), monerod_placeholders),
+            (os.path.join(tmpl_dir, xmrig_dir, systemd_dir, xmrig_service_file), xmrig_placeholders),
+        ]
 
-        # Build the db4e deployment record
-        db4e_rec['enable'] = True
-        db4e_rec['group'] = db4e_group
-        db4e_rec['install_dir'] = db4e_install_dir
-        db4e_rec['user'] = db4e_user
-        db4e_rec['vendor_dir'] = vendor_dir
-        # Update the repo deployment record
-        self.depl_mgr.update_deployent(db4e_rec)
-        return results
+        # The Monero daemon, P2Pool and XMRig binaries and start-scripts
+        files = [
+            ('P2Pool', p2pool_dir, p2pool_binary),
+            ('P2Pool', p2pool_dir, p2pool_start_script),
+            ('Monero daemon', monerod_dir, monerod_binary),
+            ('Monero daemon', monerod_dir, monerod_start_script),
+            ('XMRig', xmrig_dir, xmrig_binary),
+        ]
+        steps = []
+        for label, component_dir, file_name in files:
+            steps.append((f'{label} {file_name}', copy_file,
+                          os.path.join(tmpl_dir, component_dir, bin_dir, file_name),
+                          os.path.join(vendor_dir, component_dir, bin_dir, file_name)))
+        return dirs, units, steps
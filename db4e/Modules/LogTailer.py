@@ -0,0 +1,280 @@
+"""
+db4e/Modules/LogTailer.py
+
+   Database 4 Everything
+   Author: Nadim-Daniel Ghaznavi
+   Copyright (c) 2024-2025 NadimGhaznavi <https://github.com/NadimGhaznavi/db4e>
+   License: GPL 3.0
+
+Follow a log file, like 'tail -F'. On Linux the tailer blocks on inotify
+and wakes up as soon as the log is written to, elsewhere it falls back to
+polling the file once a second. Rename-and-recreate log rotation and
+truncation are handled without losing lines.
+"""
+
+import os
+import sys
+import time
+import select
+import struct
+import ctypes
+import ctypes.util
+import threading
+
+# inotify(7) event masks
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+
+# The log directory is watched, so the watch survives log rotation
+WATCH_MASK = (IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO |
+              IN_CREATE | IN_DELETE | IN_DELETE_SELF | IN_MOVE_SELF)
+
+# struct inotify_event: wd, mask, cookie, len, followed by the name
+EVENT_HEADER = struct.Struct('iIII')
+
+# Seconds between checks when polling
+POLL_INTERVAL = 1
+# Upper bound for blocking on inotify, the file is re-checked afterwards anyway
+WAIT_TIMEOUT = 60
+
+
+class PollWatcher:
+
+    def __init__(self, log_file: str, interval: float = POLL_INTERVAL):
+        self.interval = interval
+        self.wakeup = threading.Event()
+
+    def close(self):
+        pass
+
+    def wait(self, timeout: float = WAIT_TIMEOUT):
+        self.wakeup.wait(min(self.interval, timeout))
+        self.wakeup.clear()
+
+    def wake(self):
+        self.wakeup.set()
+
+
+class InotifyWatcher:
+
+    def __init__(self, log_file: str):
+        libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+        self.fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            err = ctypes.get_errno()
+            raise OSError(err, os.strerror(err))
+        log_dir = os.path.dirname(os.path.abspath(log_file))
+        if libc.inotify_add_watch(self.fd, os.fsencode(log_dir), WATCH_MASK) < 0:
+            err = ctypes.get_errno()
+            os.close(self.fd)
+            raise OSError(err, os.strerror(err), log_dir)
+        self.name = os.fsencode(os.path.basename(log_file))
+        # A self-pipe so that stop() can interrupt a blocking wait()
+        self.wake_r, self.wake_w = os.pipe()
+        os.set_blocking(self.wake_r, False)
+        self.poller = select.poll()
+        self.poller.register(self.fd, select.POLLIN)
+        self.poller.register(self.wake_r, select.POLLIN)
+
+    def close(self):
+        for fd in (self.fd, self.wake_r, self.wake_w):
+            os.close(fd)
+
+    def wait(self, timeout: float = WAIT_TIMEOUT):
+        # Block until something happens to the log file, other files in the
+        # log directory are ignored
+        deadline = time.monotonic() + timeout
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return
+            ready = self.poller.poll(remaining * 1000)
+            if not ready:
+                return
+            for fd, _ in ready:
+                if fd == self.wake_r:
+                    self._drain(self.wake_r)
+                    return
+            if self._log_changed():
+                return
+
+    def wake(self):
+        try:
+            os.write(self.wake_w, b'x')
+        except OSError:
+            # Already closed
+            pass
+
+    def _drain(self, fd):
+        data = b''
+        while True:
+            try:
+                chunk = os.read(fd, 65536)
+            except BlockingIOError:
+                return data
+            if not chunk:
+                return data
+            data += chunk
+
+    def _log_changed(self):
+        data = self._drain(self.fd)
+        offset = 0
+        changed = False
+        while offset + EVENT_HEADER.size <= len(data):
+            _, _, _, length = EVENT_HEADER.unpack_from(data, offset)
+            offset += EVENT_HEADER.size
+            name = data[offset:offset + length].rstrip(b'\0')
+            offset += length
+            # Events without a name are about the directory itself
+            if name == self.name or not name:
+                changed = True
+        return changed
+
+
+def get_watcher(log_file: str, poll_interval: float = POLL_INTERVAL):
+    if sys.platform.startswith('linux'):
+        try:
+            return InotifyWatcher(log_file)
+        except (OSError, AttributeError):
+            # No inotify (e.g. exhausted watches or no libc symbol), poll instead
+            pass
+    return PollWatcher(log_file, poll_interval)
+
+
+class LogTailer:
+
+    def __init__(self, log_file: str, offset: int | None = None, inode: int | None = None,
+                 poll_interval: float = POLL_INTERVAL, use_inotify: bool = True):
+        self.log_file = log_file
+        # Byte offset just past the last complete line that was returned,
+        # None means start at the end of the file. The inode identifies the
+        # file the offset belongs to, it's used to resume after a restart.
+        self.offset = offset
+        self.inode = inode
+        # Called before the tailer blocks, i.e. when it has caught up
+        self.idle_hook = None
+        self.stop_event = threading.Event()
+        if use_inotify:
+            self.watcher = get_watcher(log_file, poll_interval)
+        else:
+            self.watcher = PollWatcher(log_file, poll_interval)
+        self._fh = None
+        self._partial = b''
+
+    def follow(self):
+        self._resume()
+        try:
+            while not self.stop_event.is_set():
+                yield from self._read_lines()
+                if self._rotated():
+                    # Lines written just before the rename are still in the
+                    # old file, read them before switching over
+                    yield from self._read_lines()
+                    yield from self._flush_partial()
+                    self._open(self.log_file, 0)
+                    continue
+                if self._truncated():
+                    self._partial = b''
+                    self._fh.seek(0)
+                    self.offset = 0
+                    continue
+                if self.idle_hook:
+                    self.idle_hook()
+                self.watcher.wait(WAIT_TIMEOUT)
+        finally:
+            self.close()
+
+    def close(self):
+        if self._fh:
+            self._fh.close()
+            self._fh = None
+        if self.watcher:
+            self.watcher.close()
+            self.watcher = None
+
+    def position(self):
+        return self.inode, self.offset
+
+    def stop(self):
+        self.stop_event.set()
+        if self.watcher:
+            self.watcher.wake()
+
+    def _flush_partial(self):
+        # A last line without a newline in a rotated log file
+        if self._partial:
+            line = self._partial
+            self._partial = b''
+            self.offset += len(line)
+            yield line.decode(errors='replace') + '\n'
+
+    def _find_rotated(self, inode):
+        # Look for the file with this inode next to the log, e.g. p2pool.log.1
+        log_dir = os.path.dirname(os.path.abspath(self.log_file))
+        prefix = os.path.basename(self.log_file)
+        for entry in os.scandir(log_dir):
+            if entry.name.startswith(prefix) and entry.inode() == inode:
+                return entry.path
+        return None
+
+    def _open(self, path, offset):
+        if self._fh:
+            self._fh.close()
+        self._fh = open(path, 'rb')
+        stat = os.fstat(self._fh.fileno())
+        self.inode = stat.st_ino
+        self._partial = b''
+        if offset is None:
+            self.offset = self._fh.seek(0, os.SEEK_END)
+        elif offset > stat.st_size:
+            # Truncated since the offset was recorded
+            self.offset = self._fh.seek(0)
+        else:
+            self.offset = self._fh.seek(offset)
+
+    def _resume(self):
+        if self.offset is None:
+            self._open(self.log_file, None)
+            return
+        log_inode = os.stat(self.log_file).st_ino
+        if self.inode is None or self.inode == log_inode:
+            self._open(self.log_file, self.offset)
+            return
+        # The log was rotated while we weren't watching. Finish the old file
+        # if it's still around, follow() switches over to the new log after that.
+        rotated = self._find_rotated(self.inode)
+        if rotated:
+            self._open(rotated, self.offset)
+        else:
+            self._open(self.log_file, 0)
+
+    def _read_lines(self):
+        while not self.stop_event.is_set():
+            chunk = self._fh.readline()
+            if not chunk:
+                return
+            if not chunk.endswith(b'\n'):
+                # The writer is in the middle of a line, wait for the rest
+                self._partial += chunk
+                return
+            line = self._partial + chunk
+            self._partial = b''
+            self.offset += len(line)
+            yield line.decode(errors='replace')
+
+    def _rotated(self):
+        try:
+            return os.stat(self.log_file).st_ino != self.inode
+        except FileNotFoundError:
+            # Renamed, but not recreated yet
+            return False
+
+    def _truncated(self):
+        return os.fstat(self._fh.fileno()).st_size < self._fh.tell()
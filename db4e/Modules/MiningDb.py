@@ -0,0 +1,289 @@
+"""
+db4e/Modules/MiningDb.py
+
+   Database 4 Everything
+   Author: Nadim-Daniel Ghaznavi
+   Copyright (c) 2024-2025 NadimGhaznavi <https://github.com/NadimGhaznavi/db4e>
+   License: GPL 3.0
+
+All of the mining operations that result in a database operation go
+through this module. This module, in turn, uses the DbMgr to access MongoDB.
+"""
+
+import time
+from datetime import datetime, timezone
+from bson.decimal128 import Decimal128
+from pymongo.errors import DuplicateKeyError
+
+from db4e.Modules.ConfigMgr import Config
+from db4e.Modules.Db4eLogger import Db4eLogger
+from db4e.Modules.DbMgr import DbMgr
+from db4e.Modules.P2PoolLogParser import parse_hashrate
+
+# The records with a hashrate, older versions stored it as a string with a unit
+HASHRATE_DOC_TYPES = [
+    'mainchain_hashrate', 'pool_hashrate', 'sidechain_hashrate', 'worker',
+    'rt_mainchain_hashrate', 'rt_pool_hashrate', 'rt_sidechain_hashrate',
+]
+
+# The hourly series that go to the time-series metrics collection if it's enabled
+METRIC_DOC_TYPES = [
+    'mainchain_hashrate', 'pool_hashrate', 'sidechain_hashrate', 'sidechain_miners', 'worker',
+]
+# Records copied per insert_many() by migrate_metrics()
+MIGRATE_BATCH_SIZE = 1000
+
+
+class MiningDb:
+
+    def __init__(self, config: Config):
+        self.ini = config
+        self.db = DbMgr(config)
+        self.col_name = self.ini.config['db']['collection']
+        # The hourly series go to the time-series metrics collection if it's enabled
+        self.metrics_col_name = self.ini.config['db']['metrics_collection']
+        # The real-time samples, a capped collection (ring buffer)
+        self.rt_col_name = self.db.rt_collection
+        self.log = Db4eLogger('MiningDb', config)
+
+    def aggregate_events(self, doc_type, pipeline, since=None, before=None):
+        # Run an aggregation pipeline over the events of one type, e.g. the
+        # 'xmr_payment' records, optionally only the ones since and/or
+        # before a timestamp
+        match = {'doc_type': doc_type}
+        if since:
+            match['timestamp'] = {'$gte': since}
+        if before:
+            match.setdefault('timestamp', {})['$lt'] = before
+        return self.db.aggregate(self.col_name, [{'$match': match}] + pipeline)
+
+    def aggregate_metrics(self, doc_type, pipeline, since=None):
+        # Same as aggregate_events(), for the hashrate, sidechain miners and
+        # worker series. They live in the time-series collection if it's enabled.
+        if self.db.metrics_timeseries:
+            col_name = self.metrics_col_name
+            match = {'series.doc_type': doc_type}
+        else:
+            col_name = self.col_name
+            match = {'doc_type': doc_type}
+        if since:
+            match['timestamp'] = {'$gte': since}
+        return self.db.aggregate(col_name, [{'$match': match}] + pipeline)
+
+    def add_block_found(self, timestamp):
+        jdoc = {
+            'doc_type': 'block_found_event',
+            'timestamp': timestamp,
+        }
+        self.db.buffer_uniq_by_timestamp(self.col_name, jdoc)
+
+    def add_mainchain_hashrate(self, hashrate):
+        self._add_hashrate('mainchain_hashrate', hashrate)
+
+    def add_pool_hashrate(self, hashrate):
+        self._add_hashrate('pool_hashrate', hashrate)
+
+    def add_share_found(self, timestamp, worker, ip_addr, effort):
+        jdoc = {
+            'doc_type': 'share_found_event',
+            'timestamp': timestamp,
+            'worker': worker,
+            'ip_addr': ip_addr,
+            'effort': effort,
+        }
+        self.db.buffer_uniq_by_timestamp(self.col_name, jdoc)
+
+    def add_share_position(self, position):
+        self._add_rt_sample('share_position', {'position': position})
+
+    def add_sidechain_hashrate(self, hashrate):
+        self._add_hashrate('sidechain_hashrate', hashrate)
+
+    def add_sidechain_miners(self, num_miners):
+        # Store the number of unique wallets on the sidechain
+        self._add_metric('sidechain_miners', {'sidechain_miners': num_miners})
+
+    def add_to_wallet(self, amount):
+        # CAREFUL with datatypes here!!! The amount is a Decimal128, the
+        # server adds it to the balance so concurrent payments aren't lost.
+        self.db.inc_one(self.col_name, {'doc_type': 'wallet_balance'}, {'balance': amount}, upsert=True)
+
+    def add_xmr_payment(self, timestamp, payout):
+        jdoc = {
+            'doc_type': 'xmr_payment',
+            'timestamp': timestamp,
+            'payment': payout,
+        }
+        # The wallet balance is only updated for new payments
+        self.db.buffer_uniq_by_timestamp(self.col_name, jdoc, on_insert=lambda: self.add_to_wallet(payout))
+
+    def flush(self):
+        # Write the buffered block found, share found and payment events
+        return self.db.flush()
+
+    def get_docs(self, doc_type):
+        return self.db.find_many(self.col_name, {'doc_type': doc_type})
+
+    def get_log_checkpoint(self, log_file):
+        return self.db.find_one(self.col_name, {'doc_type': 'log_checkpoint', 'log_file': log_file})
+
+    def get_rt_history(self, doc_type, num_samples):
+        # The latest samples of a real-time series, oldest first
+        samples = list(self.db.find_latest(self.rt_col_name, {'doc_type': doc_type}, num_samples))
+        samples.reverse()
+        return samples
+
+    def get_rt_record(self, doc_type):
+        # The latest real-time (rt_*) or 'share_position' sample
+        for sample in self.db.find_latest(self.rt_col_name, {'doc_type': doc_type}):
+            return sample
+        return None
+
+    def get_wallet_balance(self):
+        record = self.db.find_one(self.col_name, {'doc_type': 'wallet_balance'})
+        if not record:
+            jdoc = {'doc_type': 'wallet_balance', 'balance': Decimal128('0')}
+            self.db.insert_one(self.col_name, jdoc)
+            return Decimal128('0')
+        return record['balance']
+
+    def get_workers(self):
+        workers = {}
+        if self.db.metrics_timeseries:
+            # The latest sample of each worker
+            pipeline = [
+                {'$match': {'series.doc_type': 'worker'}},
+                {'$sort': {'timestamp': 1}},
+                {'$group': {
+                    '_id': '$series.worker_name',
+                    'hashrate': {'$last': '$hashrate'},
+                    'timestamp': {'$last': '$timestamp'},
+                    'active': {'$last': '$active'},
+                }},
+            ]
+            for worker in self.db.aggregate(self.metrics_col_name, pipeline):
+                worker_name = worker['_id']
+                workers[worker_name] = {
+                    'worker_name': worker_name,
+                    'hashrate': worker['hashrate'],
+                    'timestamp': worker['timestamp'],
+                    'active': worker['active'],
+                }
+            return workers
+        for worker in self.get_docs('worker'):
+            worker_name = worker['worker_name']
+            workers[worker_name] = {
+                'worker_name': worker_name,
+                'hashrate': worker['hashrate'],
+                'timestamp': worker['timestamp'],
+                'active': worker['active'],
+            }
+        return workers
+
+    def migrate_hashrates(self):
+        # One-off conversion of '6.889 KH/s' style hashrates into float H/s
+        filter = {'doc_type': {'$in': HASHRATE_DOC_TYPES}, 'hashrate': {'$type': 'string'}}
+        updates = []
+        for doc in self.db.find_many(self.col_name, filter):
+            try:
+                hashrate = parse_hashrate(doc['hashrate'])
+            except (KeyError, ValueError):
+                self.log.warning(f"Unable to parse hashrate: {doc['hashrate']}")
+                continue
+            updates.append(({'_id': doc['_id']}, {'hashrate': hashrate}))
+        return self.db.bulk_set(self.col_name, updates)
+
+    def migrate_metrics(self):
+        # One-off copy of the hourly series written before the time-series
+        # metrics collection was enabled. Only the records older than the
+        # first sample in the metrics collection are copied, newest first,
+        # so an interrupted copy is picked up where it stopped.
+        if not self.db.metrics_timeseries:
+            return 0
+        filter = {'doc_type': {'$in': METRIC_DOC_TYPES}, 'timestamp': {'$exists': True}}
+        for first in self.db.find_many(self.metrics_col_name, {}).sort('timestamp', 1).limit(1):
+            filter['timestamp'] = {'$lt': first['timestamp']}
+        num_copied = 0
+        batch = []
+        for doc in self.db.find_many(self.col_name, filter).sort('timestamp', -1):
+            series = {'doc_type': doc.pop('doc_type')}
+            worker_name = doc.pop('worker_name', None)
+            if worker_name:
+                series['worker_name'] = worker_name
+            doc.pop('_id')
+            batch.append(dict(doc, series=series))
+            if len(batch) >= MIGRATE_BATCH_SIZE:
+                self.db.insert_many(self.metrics_col_name, batch)
+                num_copied += len(batch)
+                batch = []
+        if batch:
+            self.db.insert_many(self.metrics_col_name, batch)
+            num_copied += len(batch)
+        if num_copied:
+            self.log.info(f'Copied {num_copied} hourly records to the {self.metrics_col_name} collection')
+        return num_copied
+
+    def follow_rt(self, doc_types):
+        # Yield new real-time samples of the given series as they're written.
+        # The tailable cursor dies if the collection is empty, it's reopened.
+        filter = {'doc_type': {'$in': doc_types}}
+        last = self.db.find_latest(self.rt_col_name, filter)
+        for sample in last:
+            filter['_id'] = {'$gt': sample['_id']}
+        while True:
+            cursor = self.db.tail(self.rt_col_name, filter)
+            while cursor.alive:
+                for sample in cursor:
+                    filter['_id'] = {'$gt': sample['_id']}
+                    yield sample
+            time.sleep(1)
+
+    def set_log_checkpoint(self, log_file, inode, offset, last_timestamp):
+        # How far the log monitor got: the log file's inode, the byte offset
+        # of the next line and the timestamp of the last event
+        filter = {'doc_type': 'log_checkpoint', 'log_file': log_file}
+        new_values = {
+            'inode': inode,
+            'offset': offset,
+            'last_timestamp': last_timestamp,
+            'updated': datetime.now(timezone.utc),
+        }
+        self.db.update_one(self.col_name, filter, new_values, upsert=True)
+
+    def update_worker(self, worker_name, hashrate):
+        self._add_metric('worker', {'hashrate': hashrate, 'active': True}, worker_name)
+
+    def _add_hashrate(self, doc_type, hashrate):
+        # Append a 'realtime' (rt) sample first, then update the historical,
+        # hourly record. See _add_metric() for how duplicates are avoided.
+        self._add_rt_sample('rt_' + doc_type, {'hashrate': hashrate})
+        self._add_metric(doc_type, {'hashrate': hashrate})
+
+    def _add_metric(self, doc_type, values, worker_name=None):
+        if self.db.metrics_timeseries:
+            # Time-series collections are append only, every sample is kept
+            # and the hourly values are computed when reading
+            series = {'doc_type': doc_type}
+            if worker_name:
+                series['worker_name'] = worker_name
+            jdoc = dict(values, series=series, timestamp=datetime.now(timezone.utc))
+            self.db.insert_one(self.metrics_col_name, jdoc)
+            return
+        # The filter matches the unique (doc_type, timestamp, worker_name)
+        # index, worker_name is None for the other series. If two upserts
+        # race, the one that loses gets a DuplicateKeyError and is retried
+        # as an update. If the index couldn't be created (see ensure_indexes())
+        # a race can still leave two records for the hour.
+        filter = {'doc_type': doc_type, 'timestamp': self._hour(), 'worker_name': worker_name}
+        try:
+            self.db.update_one(self.col_name, filter, values, upsert=True)
+        except DuplicateKeyError:
+            self.db.update_one(self.col_name, filter, values, upsert=True)
+
+    def _add_rt_sample(self, doc_type, values):
+        # O(1) append, the capped collection drops the oldest samples
+        jdoc = dict(values, doc_type=doc_type, timestamp=datetime.now(timezone.utc))
+        self.db.insert_one(self.rt_col_name, jdoc)
+
+    def _hour(self):
+        return datetime.now(timezone.utc).replace(minute=0, second=0, microsecond=0)
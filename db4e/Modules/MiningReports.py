@@ -0,0 +1,287 @@
+"""
+db4e/Modules/MiningReports.py
+
+   Database 4 Everything
+   Author: Nadim-Daniel Ghaznavi
+   Copyright (c) 2024-2025 NadimGhaznavi <https://github.com/NadimGhaznavi/db4e>
+   License: GPL 3.0
+
+Generate the CSV files for the mining reports. The daily, cumulative and
+per-miner rollups are done by MongoDB aggregation pipelines, only the
+aggregated rows are returned to Python. After the first run the reports
+are updated incrementally, the ReportScheduler collects bursts of events
+into a single update.
+"""
+
+import os
+import time
+import threading
+from datetime import datetime
+from decimal import Decimal
+from bson.decimal128 import Decimal128
+
+from db4e.Modules.ConfigMgr import Config
+from db4e.Modules.Db4eLogger import Db4eLogger
+from db4e.Modules.MiningDb import MiningDb
+from db4e.Modules.P2PoolLogParser import HASHRATE_UNITS
+
+# Report sets, e.g. csv/payments/daily-payment-90days.csv. Every report has
+# an "all data" CSV file and one CSV file per length (in days).
+REPORTS = {
+    'blocksfound': [
+        {'report_type': 'blocksfound', 'title': 'Blocks Found on the Mini Sidechain',
+         'units': 'blocks', 'columns': 'Date,BlocksFound', 'lengths': [30, 60, 90, 180]},
+    ],
+    'hashrates': [
+        {'report_type': 'hashrate', 'sub_type': 'pool', 'title': 'Hashrate of the Local Pool in KH/s',
+         'units': 'KH/s', 'columns': 'Datetime,Hashrate', 'lengths': [30, 60, 90]},
+        {'report_type': 'hashrate', 'sub_type': 'sidechain', 'title': 'Hashrate of the Sidechain in MH/s',
+         'units': 'MH/s', 'columns': 'Datetime,Hashrate', 'lengths': [30, 60, 90]},
+        {'report_type': 'hashrate', 'sub_type': 'mainchain', 'title': 'Hashrate of the Mainchain in GH/s',
+         'units': 'GH/s', 'columns': 'Datetime,Hashrate', 'lengths': [30, 60, 90]},
+    ],
+    'payments': [
+        {'report_type': 'payment', 'sub_type': 'daily', 'title': 'Daily XMR Payments from P2Pool Mining',
+         'columns': 'Date,Total', 'lengths': [60, 90, 180]},
+        {'report_type': 'payment', 'sub_type': 'cumulative', 'title': 'Cumulative XMR Earnings from P2Pool Mining',
+         'columns': 'Date,Total', 'lengths': [60, 90, 180]},
+    ],
+    'sharesfound': [
+        {'report_type': 'sharesfound', 'title': 'Shares Found on the Mini Sidechain',
+         'columns': 'Date,SharesFound', 'lengths': [30, 60, 90]},
+        {'report_type': 'sharesfound', 'sub_type': 'by-miner', 'title': 'Shares found by miner on the Mini Sidechain',
+         'columns': 'Date', 'lengths': [30, 60, 90]},
+    ],
+}
+
+# Report type -> the event doc_type that's counted or summed per day
+EVENT_DOC_TYPES = {
+    'blocksfound': 'block_found_event',
+    'payment': 'xmr_payment',
+    'sharesfound': 'share_found_event',
+}
+
+CSV_DIR = 'csv'
+
+# A burst of events is collected for this many seconds before the reports
+# are updated, but no update is delayed for more than REPORT_MAX_DELAY
+REPORT_DELAY = 10
+REPORT_MAX_DELAY = 60
+
+
+class MiningReports:
+
+    def __init__(self, config: Config, web_dir: str):
+        self.ini = config
+        self.db = MiningDb(config)
+        # The CSV files go into <web_dir>/csv/<reports_name>/
+        self.web_dir = web_dir
+        self.log = Db4eLogger('MiningReports', config)
+
+    def csv_file(self, reports_name, report, length=None):
+        if 'sub_type' in report:
+            base_name = f"{report['sub_type']}-{report['report_type']}"
+        else:
+            base_name = report['report_type']
+        if length:
+            base_name += f'-{length}days'
+        return os.path.join(self.web_dir, CSV_DIR, reports_name, base_name + '.csv')
+
+    def get_columns(self, report):
+        if report.get('sub_type') == 'by-miner':
+            # One column per active worker
+            return ['Date'] + self.get_active_workers()
+        return report['columns'].split(',')
+
+    def get_active_workers(self):
+        workers = self.db.get_workers()
+        return [ name for name, worker in workers.items() if worker['active'] ]
+
+    def get_rows(self, report, since=None):
+        report_type = report['report_type']
+        sub_type = report.get('sub_type')
+        if report_type == 'hashrate':
+            return self._hashrate_rows(sub_type, report['units'], since)
+        if sub_type == 'by-miner':
+            return self._by_miner_rows(since)
+        pipeline = [
+            {'$group': {
+                '_id': {'$dateTrunc': {'date': '$timestamp', 'unit': 'day'}},
+                'value': {'$sum': '$payment' if report_type == 'payment' else 1},
+            }},
+            {'$sort': {'_id': 1}},
+        ]
+        if sub_type == 'cumulative':
+            # Running total, the days are already sorted
+            pipeline.append({'$setWindowFields': {
+                'sortBy': {'_id': 1},
+                'output': {'value': {'$sum': '$value', 'window': {'documents': ['unbounded', 'current']}}},
+            }})
+            if since:
+                # Plus everything before 'since', summed by the server so
+                # the rounded CSV values never add up
+                total = self._total_before(report_type, since)
+                pipeline.append({'$set': {'value': {'$add': ['$value', total]}}})
+        rows = []
+        for doc in self.db.aggregate_events(EVENT_DOC_TYPES[report_type], pipeline, since):
+            value = doc['value']
+            if report_type == 'payment':
+                value = round(Decimal(value.to_decimal()), 4)
+            rows.append([doc['_id'], value])
+        return rows
+
+    def run(self, reports_name):
+        # Write the "all data" CSV file and the shorter versions of each report
+        os.makedirs(os.path.join(self.web_dir, CSV_DIR, reports_name), exist_ok=True)
+        for report in REPORTS[reports_name]:
+            columns = self.get_columns(report)
+            rows = self.get_rows(report)
+            self.write_csv(self.csv_file(reports_name, report), columns, rows)
+            for length in report['lengths']:
+                self.write_csv(self.csv_file(reports_name, report, length), columns,
+                               rows[-self._num_rows(report, length):])
+
+    def update(self, reports_name):
+        # Incremental version of run(): the last row of each "all data" CSV
+        # file is recomputed, newer rows are appended and the shorter
+        # versions are sliced from the result
+        os.makedirs(os.path.join(self.web_dir, CSV_DIR, reports_name), exist_ok=True)
+        for report in REPORTS[reports_name]:
+            self.update_report(reports_name, report)
+
+    def update_report(self, reports_name, report):
+        csv_file = self.csv_file(reports_name, report)
+        columns = self.get_columns(report)
+        header = self._csv_line(columns)
+        try:
+            with open(csv_file, 'rb') as f:
+                lines = f.readlines()
+        except FileNotFoundError:
+            lines = []
+        if len(lines) < 2 or lines[0] != header:
+            # First run, no data yet or the active workers changed
+            rows = self.get_rows(report)
+            self.write_csv(csv_file, columns, rows)
+            lines = [header] + [ self._csv_line(row) for row in rows ]
+        else:
+            since = datetime.fromisoformat(lines[-1].split(b',')[0].decode())
+            rows = self.get_rows(report, since)
+            new_lines = [ self._csv_line(row) for row in rows ]
+            if not new_lines or new_lines == lines[-1:]:
+                # Nothing changed
+                return
+            with open(csv_file, 'r+b') as f:
+                f.seek(sum(len(line) for line in lines[:-1]))
+                f.truncate()
+                f.writelines(new_lines)
+            lines = lines[:-1] + new_lines
+        for length in report['lengths']:
+            with open(self.csv_file(reports_name, report, length), 'wb') as f:
+                f.write(header)
+                f.writelines(lines[1:][-self._num_rows(report, length):])
+
+    def write_csv(self, csv_file, columns, rows):
+        with open(csv_file, 'wb') as f:
+            f.write(self._csv_line(columns))
+            for row in rows:
+                f.write(self._csv_line(row))
+        self.log.debug(f'Created CSV file ({csv_file})')
+
+    def _by_miner_rows(self, since):
+        workers = self.get_active_workers()
+        pipeline = [
+            {'$group': {
+                '_id': {'day': {'$dateTrunc': {'date': '$timestamp', 'unit': 'day'}}, 'worker': '$worker'},
+                'shares': {'$sum': 1},
+            }},
+            {'$group': {
+                '_id': '$_id.day',
+                'shares': {'$push': {'k': '$_id.worker', 'v': '$shares'}},
+            }},
+            {'$sort': {'_id': 1}},
+            {'$project': {'shares': {'$arrayToObject': '$shares'}}},
+        ]
+        rows = []
+        for doc in self.db.aggregate_events('share_found_event', pipeline, since):
+            rows.append([doc['_id']] + [ doc['shares'].get(worker, 0) for worker in workers ])
+        return rows
+
+    def _csv_line(self, row):
+        return (','.join(str(value) for value in row) + '\n').encode()
+
+    def _hashrate_rows(self, sub_type, units, since):
+        # The last hashrate of every hour, in the report's units
+        pipeline = [
+            {'$sort': {'timestamp': 1}},
+            {'$group': {
+                '_id': {'$dateTrunc': {'date': '$timestamp', 'unit': 'hour'}},
+                'hashrate': {'$last': '$hashrate'},
+            }},
+            {'$sort': {'_id': 1}},
+            {'$project': {'hashrate': {'$round': [{'$divide': ['$hashrate', HASHRATE_UNITS[units]]}, 3]}}},
+        ]
+        return [ [doc['_id'], doc['hashrate']]
+                 for doc in self.db.aggregate_metrics(f'{sub_type}_hashrate', pipeline, since) ]
+
+    def _total_before(self, report_type, before):
+        # The exact sum (count for the shares and blocks) of the events before a timestamp
+        pipeline = [
+            {'$group': {
+                '_id': None,
+                'total': {'$sum': '$payment' if report_type == 'payment' else 1},
+            }},
+        ]
+        for doc in self.db.aggregate_events(EVENT_DOC_TYPES[report_type], pipeline, before=before):
+            return doc['total']
+        return Decimal128('0') if report_type == 'payment' else 0
+
+    def _num_rows(self, report, length):
+        # The hashrate data is hourly, everything else is daily
+        if report['report_type'] == 'hashrate':
+            return length * 24
+        return length
+
+
+class ReportScheduler:
+
+    def __init__(self, reports: MiningReports, delay: float = REPORT_DELAY,
+                 max_delay: float = REPORT_MAX_DELAY):
+        self.reports = reports
+        self.delay = delay
+        self.max_delay = max_delay
+        # Report set name -> when the first event of the burst came in
+        self.pending = {}
+        self.timer = None
+        self.lock = threading.Lock()
+        # Only one update at a time
+        self.run_lock = threading.Lock()
+
+    def run_pending(self):
+        with self.lock:
+            pending = list(self.pending)
+            self.pending = {}
+            self.timer = None
+        with self.run_lock:
+            for reports_name in pending:
+                self.reports.update(reports_name)
+
+    def schedule(self, reports_name):
+        # Restart the timer on every event, until the oldest pending event
+        # has waited max_delay seconds
+        with self.lock:
+            now = time.monotonic()
+            self.pending.setdefault(reports_name, now)
+            if self.timer:
+                self.timer.cancel()
+            oldest = min(self.pending.values())
+            delay = max(0, min(self.delay, oldest + self.max_delay - now))
+            self.timer = threading.Timer(delay, self.run_pending)
+            self.timer.daemon = True
+            self.timer.start()
+
+    def stop(self):
+        # Don't lose the updates of the last burst
+        with self.lock:
+            if self.timer:
+                self.timer.cancel()
+        self.run_pending()
@@ -0,0 +1,157 @@
+"""
+db4e/Modules/P2PoolLogParser.py
+
+   Database 4 Everything
+   Author: Nadim-Daniel Ghaznavi
+   Copyright (c) 2024-2025 NadimGhaznavi <https://github.com/NadimGhaznavi/db4e>
+   License: GPL 3.0
+
+Classify P2Pool log lines in a single pass. A precompiled alternation of
+literal tokens (e.g. "SHARE FOUND", "got a payout of") is used as a cheap
+prefilter, only the one pattern that belongs to the matched token is run.
+Most log lines contain none of the tokens and are rejected after one scan.
+"""
+
+import re
+from dataclasses import dataclass, field
+from datetime import datetime
+from bson.decimal128 import Decimal128
+
+# Event types
+BLOCK_FOUND = 'block_found'
+MAINCHAIN_HASHRATE = 'mainchain_hashrate'
+POOL_HASHRATE = 'pool_hashrate'
+SHARE_FOUND = 'share_found'
+SHARE_POSITION = 'share_position'
+SIDECHAIN_HASHRATE = 'sidechain_hashrate'
+WORKER_STATS = 'worker_stats'
+XMR_PAYMENT = 'xmr_payment'
+
+# Share found events on chains with a lower sidechain height are ignored
+MIN_SIDECHAIN_HEIGHT = 1000000
+
+# An empty share position window
+NO_SHARES_POSITION = '[..............................]'
+
+# Hashrates are stored as float H/s, whatever unit P2Pool printed them in
+HASHRATE_UNITS = {'H/s': 1, 'KH/s': 1e3, 'MH/s': 1e6, 'GH/s': 1e9, 'TH/s': 1e12}
+
+TIMESTAMP = r'(?P<timestamp>\d{4}-\d{2}-\d{2} \d{2}:\d{2}):\d{2}\.\d{4}'
+
+# Literal token -> (event type, pattern). Sample log lines:
+#
+# 2024-11-09 19:52:19.1734 P2Pool BLOCK FOUND: main chain block at height 3277801 was mined by someone else in this p2pool
+# Main chain hashrate       = 3.105 GH/s
+# Hashrate (1h  est)   = 7.384 KH/s
+# 2024-11-10 00:47:47.5596 StratumServer SHARE FOUND: mainchain height 3277956, sidechain height 9143872, diff 126624856, client 192.168.0.86:37294, user sally, effort 91.663%
+# Your shares position      = [.........................1....]
+# Your shares               = 0 blocks (+0 uncles, 0 orphans)
+# Side chain hashrate       = 12.291 MH/s
+# 2024-11-09 20:05:01.4647 StratumServer 192.168.0.27:57888         no     14h 59m 52s         23666               788 H/s        paris
+# 2024-11-09 19:52:19.1740 P2Pool Your wallet 48wY7nYBsQNSw7fDEG got a payout of 0.001080066485 XMR in block 3277801
+#
+# The prefilter returns the left-most token in a line, so a token must not
+# appear in front of the token that identifies another event type. The
+# worker stats line is identified by its "H/s" column, all of the hashrate
+# lines name their hashrate before the unit.
+RULES = {
+    'BLOCK FOUND': (BLOCK_FOUND,
+        TIMESTAMP + r' P2Pool BLOCK FOUND'),
+    'Main chain hashrate': (MAINCHAIN_HASHRATE,
+        r'Main chain hashrate .* = (?P<hashrate>\d+(?:\.\d+)? [KMGT]?H/s)'),
+    'Hashrate (1h  est)': (POOL_HASHRATE,
+        r'Hashrate \(1h  est\) .* = (?P<hashrate>\d+(?:\.\d+)? [KMGT]?H/s)'),
+    'SHARE FOUND': (SHARE_FOUND,
+        TIMESTAMP + r' StratumServer SHARE FOUND:.* sidechain height (?P<height>\d+).*client '
+        r'(?P<ip_addr>\d+\.\d+\.\d+\.\d+):\d+, user (?P<worker>.*), effort (?P<effort>\d+\.\d+)'),
+    'Your shares': (SHARE_POSITION,
+        r'Your shares (?:position .* = (?P<position>\[.*\])|.* = 0 )'),
+    'Side chain hashrate': (SIDECHAIN_HASHRATE,
+        r'Side chain hashrate .* = (?P<hashrate>\d+(?:\.\d+)? [KMGT]?H/s)'),
+    'got a payout of': (XMR_PAYMENT,
+        TIMESTAMP + r' .*got a payout of (?P<payout>0\.\d+) XMR'),
+    'H/s': (WORKER_STATS,
+        TIMESTAMP + r' StratumServer (?P<ip_addr>\d+\.\d+\.\d+\.\d+):\d+\s+no\s+\d+h \d+m \d+s\s+\d+\s+'
+        r'(?P<hashrate>\d+(?:\.\d+)? [KMG]?H/s)\s+(?P<worker_name>.*)$'),
+}
+
+
+def parse_hashrate(hashrate: str) -> float:
+    # E.g. '6.889 KH/s' -> 6889.0
+    value, unit = hashrate.split()
+    return float(value) * HASHRATE_UNITS[unit]
+
+
+@dataclass
+class LogEvent:
+    event: str = ""
+    data: dict = field(default_factory=dict)
+
+
+class P2PoolLogParser:
+
+    def __init__(self):
+        # Compile everything once, the tokens are matched longest first
+        tokens = sorted(RULES, key=len, reverse=True)
+        self.prefilter = re.compile('|'.join(re.escape(token) for token in tokens))
+        self.rules = {}
+        for token, (event, pattern) in RULES.items():
+            self.rules[token] = (event, re.compile(pattern))
+        self.converters = {
+            BLOCK_FOUND: self._block_found,
+            MAINCHAIN_HASHRATE: self._hashrate,
+            POOL_HASHRATE: self._hashrate,
+            SHARE_FOUND: self._share_found,
+            SHARE_POSITION: self._share_position,
+            SIDECHAIN_HASHRATE: self._hashrate,
+            WORKER_STATS: self._worker_stats,
+            XMR_PAYMENT: self._xmr_payment,
+        }
+
+    def classify(self, log_line: str) -> LogEvent | None:
+        token = self.prefilter.search(log_line)
+        if not token:
+            return None
+        event, pattern = self.rules[token.group()]
+        match = pattern.search(log_line)
+        if not match:
+            return None
+        data = self.converters[event](match)
+        if data is None:
+            return None
+        return LogEvent(event, data)
+
+    def _block_found(self, match):
+        return {'timestamp': self._timestamp(match)}
+
+    def _hashrate(self, match):
+        return {'hashrate': parse_hashrate(match.group('hashrate'))}
+
+    def _share_found(self, match):
+        if int(match.group('height')) <= MIN_SIDECHAIN_HEIGHT:
+            return None
+        return {
+            'timestamp': self._timestamp(match),
+            'worker': match.group('worker'),
+            'ip_addr': match.group('ip_addr'),
+            'effort': float(match.group('effort')),
+        }
+
+    def _share_position(self, match):
+        return {'position': match.group('position') or NO_SHARES_POSITION}
+
+    def _timestamp(self, match):
+        # Much cheaper than strptime(), the format is fixed: 'YYYY-MM-DD HH:MM'
+        return datetime.fromisoformat(match.group('timestamp'))
+
+    def _worker_stats(self, match):
+        return {
+            'worker_name': match.group('worker_name').rstrip(),
+            'hashrate': parse_hashrate(match.group('hashrate')),
+        }
+
+    def _xmr_payment(self, match):
+        return {
+            'timestamp': self._timestamp(match),
+            'payout': Decimal128(match.group('payout')),
+        }
@@ -0,0 +1,159 @@
+"""
+db4e/Modules/P2PoolMonitor.py
+
+   Database 4 Everything
+   Author: Nadim-Daniel Ghaznavi
+   Copyright (c) 2024-2025 NadimGhaznavi <https://github.com/NadimGhaznavi/db4e>
+   License: GPL 3.0
+
+Monitor a P2Pool log file and create MongoDB records based on the events
+in the log.
+"""
+
+import os
+import time
+import json
+
+from db4e.Modules.ConfigMgr import Config
+from db4e.Modules.Db4eLogger import Db4eLogger
+from db4e.Modules.LogTailer import LogTailer
+from db4e.Modules.MiningDb import MiningDb
+from db4e.Modules.MiningReports import MiningReports, ReportScheduler
+from db4e.Modules.P2PoolLogParser import (
+    P2PoolLogParser, BLOCK_FOUND, MAINCHAIN_HASHRATE, POOL_HASHRATE, SHARE_FOUND,
+    SHARE_POSITION, SIDECHAIN_HASHRATE, WORKER_STATS, XMR_PAYMENT)
+
+# Save the log position after this many lines or seconds, and whenever
+# the monitor has caught up with the log
+CHECKPOINT_LINES = 1000
+CHECKPOINT_INTERVAL = 5
+
+
+class P2PoolMonitor:
+
+    def __init__(self, config: Config, log_file: str, api_file: str, web_dir: str = None):
+        self.ini = config
+        # The P2Pool log and the P2Pool API file with the pool statistics (stats_mod)
+        self.log_file = log_file
+        self.api_file = api_file
+        self.db = MiningDb(config)
+        self.parser = P2PoolLogParser()
+        # The reports are only generated if there's somewhere to put them
+        self.reports = None
+        if web_dir:
+            self.reports = ReportScheduler(MiningReports(config, web_dir))
+        self.tailer = None
+        # Checkpoint bookkeeping
+        self.last_timestamp = None
+        self.resume_after = None
+        self.unsaved_lines = 0
+        self.last_checkpoint = time.monotonic()
+        self.log = Db4eLogger('P2PoolMonitor', config)
+
+        # Event type -> handler, every log line is classified once and dispatched
+        self.handlers = {
+            BLOCK_FOUND: self.block_found,
+            MAINCHAIN_HASHRATE: self.db.add_mainchain_hashrate,
+            POOL_HASHRATE: self.db.add_pool_hashrate,
+            SHARE_FOUND: self.share_found,
+            SHARE_POSITION: self.db.add_share_position,
+            SIDECHAIN_HASHRATE: self.sidechain_hashrate,
+            WORKER_STATS: self.db.update_worker,
+            XMR_PAYMENT: self.xmr_payment,
+        }
+
+    def block_found(self, timestamp):
+        self.db.add_block_found(timestamp)
+        self.update_reports('blocksfound')
+
+    def get_sidechain_miners(self):
+        with open(self.api_file, 'r') as f:
+            api_data = json.load(f)
+        return api_data['pool']['miners']
+
+    def monitor_log(self):
+        if not os.path.exists(self.log_file):
+            self.log.critical(f"P2Pool log file ({self.log_file}) not found, exiting")
+            return None
+
+        # Records written by older versions have string hashrates
+        self.db.migrate_hashrates()
+        # The hourly series from before the time-series collection was enabled
+        self.db.migrate_metrics()
+
+        # Resume from the last checkpoint, anything P2Pool wrote while we
+        # were down is processed first, at full speed
+        checkpoint = self.db.get_log_checkpoint(self.log_file)
+        try:
+            for log_line in self.watch_log(checkpoint):
+                self.process_line(log_line)
+                self.unsaved_lines += 1
+                if self.unsaved_lines >= CHECKPOINT_LINES or \
+                        time.monotonic() - self.last_checkpoint >= CHECKPOINT_INTERVAL:
+                    self.save_checkpoint()
+        finally:
+            self.save_checkpoint()
+
+    def process_line(self, log_line):
+        event = self.parser.classify(log_line)
+        if not event:
+            return None
+        timestamp = event.data.get('timestamp')
+        if timestamp:
+            if self.resume_after and timestamp < self.resume_after:
+                # Already recorded before the log was rotated
+                return None
+            self.last_timestamp = timestamp
+        self.handlers[event.event](**event.data)
+        return event
+
+    def save_checkpoint(self):
+        if self.unsaved_lines == 0 or not self.tailer:
+            return
+        # The events have to be in the database before the checkpoint moves past them
+        self.db.flush()
+        inode, offset = self.tailer.position()
+        self.db.set_log_checkpoint(self.log_file, inode, offset, self.last_timestamp)
+        self.unsaved_lines = 0
+        self.last_checkpoint = time.monotonic()
+
+    def share_found(self, timestamp, worker, ip_addr, effort):
+        self.db.add_share_found(timestamp, worker, ip_addr, effort)
+        self.update_reports('sharesfound')
+
+    def sidechain_hashrate(self, hashrate):
+        self.db.add_sidechain_hashrate(hashrate)
+        # While we're at it, let's also collect the number of miners on the sidechain
+        try:
+            self.db.add_sidechain_miners(self.get_sidechain_miners())
+        except (FileNotFoundError, KeyError, ValueError):
+            self.log.error(f'P2Pool API file not usable: {self.api_file}')
+
+    def stop(self):
+        if self.tailer:
+            self.tailer.stop()
+        if self.reports:
+            self.reports.stop()
+
+    def update_reports(self, reports_name):
+        # Debounced, a burst of events results in one incremental update
+        if self.reports:
+            self.reports.schedule(reports_name)
+
+    def watch_log(self, checkpoint=None):
+        # Blocks on inotify (polling where that's not available) and follows
+        # the log across rotation and truncation
+        if checkpoint:
+            self.tailer = LogTailer(self.log_file, offset=checkpoint['offset'], inode=checkpoint['inode'])
+            self.last_timestamp = checkpoint.get('last_timestamp')
+            if checkpoint['inode'] != os.stat(self.log_file).st_ino:
+                self.resume_after = self.last_timestamp
+        else:
+            # First run, start at the end of the log like before
+            self.tailer = LogTailer(self.log_file)
+        self.tailer.idle_hook = self.save_checkpoint
+        return self.tailer.follow()
+
+    def xmr_payment(self, timestamp, payout):
+        self.db.add_xmr_payment(timestamp, payout)
+        self.update_reports('payments')
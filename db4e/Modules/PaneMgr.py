@@ -5,8 +5,14 @@ db4e/Modules/PaneMgr.py
    Author: Nadim-Daniel Ghaznavi 
    Copyright (c) 2024-2025 NadimGhaznavi <https://github.com/NadimGhaznavi/db4e>
    License: GPL 3.0
+
+The panes are built and mounted the first time they're shown. Only the
+'max_panes' most recently used panes are kept mounted, the others are
+removed and built again when they're needed.
 """
 
+import asyncio
+from collections import OrderedDict
 from dataclasses import dataclass, field
 from textual.css.query import NoMatches
 from textual.widget import Widget
@@ -17,6 +23,9 @@ from db4e.Modules.ConfigMgr import Config
 from db4e.Modules.PaneCatalogue import PaneCatalogue
 from db4e.Messages.UpdateTopBar import UpdateTopBar
 
+# Mounted panes, see the 'max_panes' setting
+MAX_PANES = 4
+
 @dataclass
 class PaneState:
     name: str = ""
@@ -30,29 +39,42 @@ class PaneMgr(Widget):
         self.config = config
         self.catalogue = catalogue
         self.initialized_flag = initialized_flag
-        self.panes = {}
+        self.max_panes = config.config.get('db4e', {}).get('max_panes', MAX_PANES)
+        # The mounted panes, least recently used first
+        self.panes = OrderedDict()
+        # Serializes the mounts, two callers never build the same pane
+        self.mount_lock = asyncio.Lock()
 
     def compose(self):
-        with ContentSwitcher(initial=self.pane_state.name, id="content_switcher"):
-            for pane_name in self.catalogue.registry:
-                # Instantiate each pane once, store a reference
-                pane = self.catalogue.get_pane(pane_name)
-                self.panes[pane_name] = pane
-                yield pane
+        # Empty, the panes are mounted by get_pane()
+        yield ContentSwitcher(id="content_switcher")
 
     async def on_mount(self) -> None:
         initial = PaneState(name='Welcome' if self.initialized_flag else 'InitialSetup', data={})
-        self.set_pane(initial.name, initial.data)
+        await self.set_pane(initial.name, initial.data)
+
+    async def get_pane(self, name: str):
+        # Build and mount the pane on first use, evict the least recently used one.
+        # The pane is returned once it is mounted, so callers can query it.
+        async with self.mount_lock:
+            if name in self.panes:
+                self.panes.move_to_end(name)
+                return self.panes[name]
+            pane = self.catalogue.get_pane(name)
+            await self.query_one("#content_switcher", ContentSwitcher).mount(pane)
+            self.panes[name] = pane
+            while len(self.panes) > self.max_panes:
+                _, old_pane = self.panes.popitem(last=False)
+                await old_pane.remove()
+            return pane
 
-    def set_pane(self, name: str, data: dict | None = None):
+    async def set_pane(self, name: str, data: dict | None = None):
+        pane = await self.get_pane(name)
         self.pane_state = PaneState(name, data)
         # If the pane supports set_data, update it with new data
-        print(f"PaneMgr:set_pane(): name: {name}")
-        if data and name in self.panes:
-            pane = self.panes[name]
-            if hasattr(pane, "set_data"):
-                print(f"PaneMgr: set_pane(): data {data}")
-                pane.set_data(data)
+        if data and hasattr(pane, "set_data"):
+            pane.set_data(data)
+        return pane
 
     def watch_pane_state(self, old: PaneState, new: PaneState):
         try:
@@ -0,0 +1,207 @@
+"""
+db4e/Modules/Reconciler.py
+
+   Database 4 Everything
+   Author: Nadim-Daniel Ghaznavi
+   Copyright (c) 2024-2025 NadimGhaznavi <https://github.com/NadimGhaznavi/db4e>
+   License: GPL 3.0
+
+The db4e service (db4e -s). The Monero, P2Pool and XMRig services are
+brought in line with their deployment records. A change stream on the
+deployment collection drives the reconciler, so an enable or disable in
+the UI is acted on right away. On a standalone mongod, without change
+streams, the records are polled every 'refresh_interval' seconds and
+only the changed ones are reconciled. Different deployments are
+reconciled concurrently, each deployment by one thread at a time.
+"""
+
+import time
+import signal
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pymongo.errors import OperationFailure, PyMongoError
+
+from db4e.Modules.ConfigMgr import Config
+from db4e.Modules.Db4eLogger import Db4eLogger
+from db4e.Modules.DeploymentMgr import DeploymentMgr
+from db4e.Modules.SystemdMgr import SystemdMgr
+
+# The components with systemd services
+COMPONENTS = ('monerod', 'p2pool', 'xmrig')
+# Deployments that are reconciled at the same time
+RECONCILE_WORKERS = 8
+# Every deployment is reconciled this often (seconds) anyway, e.g. to
+# restart a service that died
+RESYNC_INTERVAL = 300
+# Milliseconds the change stream waits for a change before the reconciler
+# checks for a shutdown or resync
+WATCH_WAIT_MS = 1000
+# Seconds between the polls, if 'refresh_interval' isn't set
+POLL_INTERVAL = 15
+# The deployment record fields the reconciler acts on. Changes to the other
+# fields, e.g. the 'status' and 'updated' it writes itself, are ignored.
+RECONCILE_FIELDS = ('enable', 'op', 'remote')
+
+
+class Reconciler:
+
+    def __init__(self, config: Config):
+        self.ini = config
+        self.depl_mgr = DeploymentMgr(config)
+        self.systemd = SystemdMgr(config)
+        self.poll_interval = config.config.get('db4e', {}).get('refresh_interval', POLL_INTERVAL)
+        self.executor = ThreadPoolExecutor(max_workers=RECONCILE_WORKERS, thread_name_prefix='Reconciler')
+        self.stopped = threading.Event()
+        # (component, instance) -> the latest record that's waiting to be
+        # reconciled, and the deployments that are being reconciled
+        self.pending = {}
+        self.busy = set()
+        self.lock = threading.Lock()
+        # Polling: (component, instance) -> the record as it was last seen
+        self.seen = {}
+        self.last_resync = None
+        self.log = Db4eLogger('Reconciler', config)
+
+    def ensure_running(self, component, instance):
+        unit = f'{component}@{instance}'
+        if self.systemd.active(unit):
+            return
+        rc = self.systemd.start(unit)
+        if rc == 0:
+            self.depl_mgr.update_deployment_instance(component, instance, {'status': 'running'})
+            self.log.info(f'Started {component}/{instance}')
+        else:
+            self.log.error(f'Failed to start {component}/{instance}, return code was {rc}')
+
+    def ensure_stopped(self, component, instance):
+        unit = f'{component}@{instance}'
+        if not self.systemd.active(unit):
+            return
+        rc = self.systemd.stop(unit)
+        if rc == 0:
+            self.depl_mgr.update_deployment_instance(component, instance, {'status': 'stopped'})
+            self.log.info(f'Stopped {component}/{instance}')
+        else:
+            self.log.error(f'Failed to stop {component}/{instance}, return code was {rc}')
+
+    def poll(self):
+        # Fallback for a standalone mongod. Returns after a resync interval,
+        # so run() tries the change stream again.
+        started = time.monotonic()
+        while not self.stopped.is_set() and time.monotonic() - started < RESYNC_INTERVAL:
+            try:
+                self.poll_changes()
+            except PyMongoError as e:
+                # MongoDB is down, try again on the next poll and resync then
+                self.log.error(f'Unable to poll the deployments, retrying: {e}')
+                self.last_resync = None
+            self.stopped.wait(self.poll_interval)
+
+    def poll_changes(self):
+        # Reconcile the deployments whose records changed since the last poll
+        resync = self.last_resync is None or time.monotonic() - self.last_resync >= RESYNC_INTERVAL
+        if resync:
+            self.last_resync = time.monotonic()
+        num_changed = 0
+        for depl in self.depl_mgr.get_deployments(COMPONENTS):
+            key = (depl['component'], depl['instance'])
+            fields = { field: depl.get(field) for field in RECONCILE_FIELDS }
+            if resync or self.seen.get(key) != fields:
+                self.seen[key] = fields
+                self.submit(depl)
+                num_changed += 1
+        return num_changed
+
+    def reconcile(self, depl):
+        component = depl['component']
+        instance = depl['instance']
+        op = depl.get('op')
+        enable = depl.get('enable', False)
+        if op:
+            self.log.info(f'Received {component}/{instance} op ({op})')
+        if op == 'enable':
+            self.depl_mgr.update_deployment_instance(component, instance, {'enable': True, 'op': None})
+            enable = True
+        elif op == 'disable':
+            self.depl_mgr.update_deployment_instance(component, instance, {'enable': False, 'op': None})
+            enable = False
+        elif op == 'delete':
+            if not depl.get('remote'):
+                self.ensure_stopped(component, instance)
+            self.depl_mgr.delete_deployment_instance(component, instance)
+            return
+
+        if depl.get('remote'):
+            return
+        if enable:
+            self.ensure_running(component, instance)
+        else:
+            self.ensure_stopped(component, instance)
+
+    def resync(self):
+        # Reconcile every deployment
+        self.last_resync = time.monotonic()
+        for depl in self.depl_mgr.get_deployments(COMPONENTS):
+            self.submit(depl)
+
+    def run(self):
+        signal.signal(signal.SIGINT, self.shutdown)
+        signal.signal(signal.SIGTERM, self.shutdown)
+        self.log.info('db4e service started')
+        while not self.stopped.is_set():
+            try:
+                self.watch()
+            except OperationFailure as e:
+                self.log.info(f'No change streams ({e}), polling every {self.poll_interval} seconds')
+                self.poll()
+            except PyMongoError as e:
+                self.log.error(f'Lost the deployment change stream, retrying: {e}')
+                self.stopped.wait(self.poll_interval)
+        self.executor.shutdown(wait=True)
+        self.log.info('db4e service stopped')
+
+    def shutdown(self, signum=None, frame=None):
+        self.log.info(f'Shutdown requested (signal {signum})')
+        self.stopped.set()
+
+    def submit(self, depl):
+        # A deployment is reconciled by one worker at a time. Changes that
+        # come in meanwhile are collapsed into one more run with the latest
+        # record.
+        key = (depl['component'], depl['instance'])
+        with self.lock:
+            self.pending[key] = depl
+            if key in self.busy:
+                return
+            self.busy.add(key)
+        self.executor.submit(self._work, key)
+
+    def watch(self):
+        # Updates that don't touch the RECONCILE_FIELDS are skipped by the server
+        acted_on = [ {f'updateDescription.updatedFields.{field}': {'$exists': True}}
+                     for field in RECONCILE_FIELDS ]
+        pipeline = [{'$match': {'fullDocument.doc_type': 'deployment',
+                                'fullDocument.component': {'$in': list(COMPONENTS)},
+                                '$or': [{'operationType': {'$ne': 'update'}}] + acted_on}}]
+        with self.depl_mgr.db.watch(self.depl_mgr.col_name, pipeline, full_document='updateLookup',
+                                    max_await_time_ms=WATCH_WAIT_MS) as stream:
+            # The stream is opened first, so changes made during the resync aren't missed
+            self.resync()
+            while not self.stopped.is_set():
+                change = stream.try_next()
+                if change:
+                    self.submit(change['fullDocument'])
+                if time.monotonic() - self.last_resync >= RESYNC_INTERVAL:
+                    self.resync()
+
+    def _work(self, key):
+        while True:
+            with self.lock:
+                depl = self.pending.pop(key, None)
+                if depl is None:
+                    self.busy.discard(key)
+                    return
+            try:
+                self.reconcile(depl)
+            except (PyMongoError, OSError) as e:
+                self.log.error(f'Unable to reconcile {key[0]}/{key[1]}: {e}')
@@ -0,0 +1,159 @@
+"""
+db4e/Modules/SystemdMgr.py
+
+   Database 4 Everything
+   Author: Nadim-Daniel Ghaznavi
+   Copyright (c) 2024-2025 NadimGhaznavi <https://github.com/NadimGhaznavi/db4e>
+   License: GPL 3.0
+
+The state of the db4e, Monero, P2Pool and XMRig systemd units. All of the
+units are fetched with a single 'systemctl show' call and the result is
+cached for one polling interval ('refresh_interval'), instead of running
+'systemctl status' for every service.
+"""
+
+import os
+import time
+import threading
+import subprocess
+from dataclasses import dataclass
+
+from db4e.Modules.ConfigMgr import Config
+from db4e.Modules.Db4eLogger import Db4eLogger
+
+# The units that are queried, the instances of the templated units included
+UNIT_PATTERNS = ('db4e.service', 'monerod@*', 'p2pool@*', 'xmrig@*')
+PROPERTIES = ('Id', 'LoadState', 'ActiveState', 'SubState', 'UnitFileState', 'MainPID')
+
+SYSTEMCTL = 'systemctl'
+# Seconds before a systemctl command is given up on
+TIMEOUT = 30
+# Seconds the unit states are cached, if 'refresh_interval' isn't set
+REFRESH_INTERVAL = 15
+
+
+@dataclass
+class UnitState:
+    name: str
+    active: bool = False
+    enabled: bool | None = None
+    installed: bool = False
+    pid: int | None = None
+    sub_state: str = ''
+
+
+class SystemdMgr:
+
+    def __init__(self, config: Config, systemctl: str = SYSTEMCTL):
+        self.ini = config
+        # The systemctl executable, the tests use a stand-in
+        self.systemctl = systemctl
+        self.refresh_interval = config.config.get('db4e', {}).get('refresh_interval', REFRESH_INTERVAL)
+        self.log = Db4eLogger('SystemdMgr', config)
+        # Unit name -> UnitState, and when they were fetched
+        self._states = {}
+        self._fetched = None
+        self._lock = threading.Lock()
+
+    def active(self, unit):
+        return self.status(unit).active
+
+    def disable(self, unit):
+        return self._run_op('disable', unit)
+
+    def enable(self, unit):
+        return self._run_op('enable', unit)
+
+    def enabled(self, unit):
+        return self.status(unit).enabled
+
+    def installed(self, unit):
+        return self.status(unit).installed
+
+    def invalidate(self):
+        # The next query runs systemctl again
+        with self._lock:
+            self._fetched = None
+
+    def pid(self, unit):
+        return self.status(unit).pid
+
+    def refresh(self):
+        # One 'systemctl show' call for all of the units
+        cmd = [self.systemctl, 'show', '--all', '--property=' + ','.join(PROPERTIES), '--', *UNIT_PATTERNS]
+        try:
+            proc = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, input=b'',
+                                  env=self._env(), timeout=TIMEOUT)
+        except (OSError, subprocess.TimeoutExpired) as e:
+            self.log.error(f'Unable to query systemd: {e}')
+            return self._states
+        if proc.returncode != 0:
+            self.log.error(f'systemctl show failed: {proc.stderr.decode(errors="replace").strip()}')
+        states = self._parse(proc.stdout.decode(errors='replace'))
+        with self._lock:
+            self._states = states
+            self._fetched = time.monotonic()
+        return states
+
+    def restart(self, unit):
+        return self._run_op('restart', unit)
+
+    def start(self, unit):
+        return self._run_op('start', unit)
+
+    def states(self):
+        # All unit states, at most one systemctl call per refresh_interval
+        with self._lock:
+            if self._fetched is not None and time.monotonic() - self._fetched < self.refresh_interval:
+                return self._states
+        return self.refresh()
+
+    def status(self, unit):
+        # Units that systemd doesn't know about aren't installed
+        if '.' not in unit:
+            unit += '.service'
+        return self.states().get(unit, UnitState(name=unit))
+
+    def stop(self, unit):
+        return self._run_op('stop', unit)
+
+    def _env(self):
+        # No color codes or pager in the output
+        return dict(os.environ, SYSTEMD_COLORS='0', SYSTEMD_PAGER='')
+
+    def _parse(self, stdout):
+        # 'systemctl show' prints a block of Key=Value lines per unit
+        states = {}
+        for block in stdout.strip().split('\n\n'):
+            props = {}
+            for line in block.splitlines():
+                key, _, value = line.partition('=')
+                props[key] = value
+            if not props.get('Id'):
+                continue
+            pid = int(props.get('MainPID') or 0)
+            active = props.get('ActiveState') == 'active'
+            unit_file_state = props.get('UnitFileState', '')
+            states[props['Id']] = UnitState(
+                name=props['Id'],
+                active=active,
+                enabled=unit_file_state == 'enabled' if unit_file_state else None,
+                installed=props.get('LoadState') not in ('not-found', None),
+                pid=pid if active and pid else None,
+                sub_state=props.get('SubState', ''))
+        return states
+
+    def _run_op(self, op, unit):
+        # Start, stop etc. need root, the unit states are fetched again afterwards
+        cmd = ['sudo', self.systemctl, op, unit]
+        try:
+            proc = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, input=b'',
+                                  env=self._env(), timeout=TIMEOUT)
+        except (OSError, subprocess.TimeoutExpired) as e:
+            self.log.error(f'systemctl {op} {unit} failed: {e}')
+            return 5
+        finally:
+            self.invalidate()
+        if proc.returncode != 0:
+            self.log.error(f'systemctl {op} {unit} failed: {proc.stderr.decode(errors="replace").strip()}')
+        return proc.returncode
@@ -0,0 +1,99 @@
+"""
+db4e/Modules/TemplateRenderer.py
+
+   Database 4 Everything
+   Author: Nadim-Daniel Ghaznavi
+   Copyright (c) 2024-2025 NadimGhaznavi <https://github.com/NadimGhaznavi/db4e>
+   License: GPL 3.0
+
+Renders the [[KEY]] templates of the systemd units and config files. A
+template is parsed once into a list of segments and cached, rendering is
+a join. render_units() checks all of the units for placeholders without a
+value before anything is written, and only writes the units that differ
+from the installed ones.
+"""
+
+import os
+import re
+import threading
+
+PLACEHOLDER = re.compile(r'\[\[([A-Za-z0-9_]+)\]\]')
+# Where the installed systemd units live
+SYSTEMD_UNIT_DIR = '/etc/systemd/system'
+
+
+class Template:
+
+    def __init__(self, text: str):
+        # Literal text and placeholder names alternate, the names are at the
+        # odd positions
+        self.segments = PLACEHOLDER.split(text)
+        self.keys = set(self.segments[1::2])
+
+    def check(self, values: dict):
+        # The placeholders without a value and the values that aren't used
+        missing = sorted(self.keys - values.keys())
+        unused = sorted(values.keys() - self.keys)
+        return missing, unused
+
+    def render(self, values: dict):
+        # Raises KeyError for a placeholder without a value, see check()
+        segments = list(self.segments)
+        segments[1::2] = [ str(values[key]) for key in self.segments[1::2] ]
+        return ''.join(segments)
+
+
+# Template file -> ((st_mtime_ns, st_size), Template)
+_templates = {}
+_templates_lock = threading.Lock()
+
+
+def get_template(path: str):
+    # Parsed once, again only if the file changed
+    stat = os.stat(path)
+    version = (stat.st_mtime_ns, stat.st_size)
+    with _templates_lock:
+        cached = _templates.get(path)
+        if cached and cached[0] == version:
+            return cached[1]
+    with open(path, 'r') as f:
+        template = Template(f.read())
+    with _templates_lock:
+        _templates[path] = (version, template)
+    return template
+
+
+def render_units(units, out_dir: str, installed_dir: str = SYSTEMD_UNIT_DIR):
+    # units is a list of (template file, values), the unit is named after the
+    # template. The changed units are written to out_dir, for the installer.
+    # Returns {unit: {'status': ..., 'msg': ...}}, nothing is written if a
+    # placeholder is missing.
+    results = {}
+    rendered = []
+    for template_file, values in units:
+        unit = os.path.basename(template_file)
+        template = get_template(template_file)
+        missing, unused = template.check(values)
+        if missing:
+            results[unit] = {'status': 'error', 'msg': f'No value for placeholder(s): {", ".join(missing)}'}
+            continue
+        rendered.append((unit, template.render(values), unused))
+    if results:
+        return results
+
+    for unit, text, unused in rendered:
+        try:
+            with open(os.path.join(installed_dir, unit), 'r') as f:
+                installed = f.read()
+        except OSError:
+            installed = None
+        if text == installed:
+            results[unit] = {'status': 'good', 'msg': 'Installed unit is up to date'}
+            continue
+        with open(os.path.join(out_dir, unit), 'w') as f:
+            f.write(text)
+        msg = 'Rendered' if installed is None else 'Rendered, the installed unit will be updated'
+        if unused:
+            msg += f' (unused values: {", ".join(unused)})'
+        results[unit] = {'status': 'good', 'msg': msg}
+    return results
@@ -6,9 +6,12 @@ db4e/Panes/Db4E.py
    Copyright (c) 2024-2025 NadimGhaznavi <https://github.com/NadimGhaznavi/db4e>
    License: GPL 3.0
 """
-from textual.widgets import Label, MarkdownViewer, Input, Button
+from rich import box
+from rich.table import Table
+from textual.widgets import Label, MarkdownViewer, Input, Button, Static
 from textual.containers import Container, Vertical, Horizontal
 from textual.app import ComposeResult
+from textual.reactive import reactive
 
 from db4e.Messages.SubmitFormData import SubmitFormData
 
@@ -16,60 +19,118 @@ STATIC_CONTENT = """Welcome to the *Database 4 Everything Db4E Core* configurati
 On this screen uou can update your *Monero wallet* and relocate the *deployment directory*.
 """
 
+# db4e deployment record field -> label
+REC_2_BIZ = {
+    'user': 'Db4E User',
+    'group': 'Db4E Group',
+    'install_dir': 'Install Directory',
+    'vendor_dir': 'Deployment Directory',
+    'user_wallet': 'Monero Wallet',
+}
+
+# Record field -> the widget that shows it
+FIELD_WIDGETS = {
+    'user': 'db4e_user',
+    'group': 'db4e_group',
+    'install_dir': 'install_dir',
+    'vendor_dir': 'db4e_vendor_dir_input',
+    'user_wallet': 'db4e_user_wallet_input',
+}
+
 class Db4E(Container):
 
-    def set_data(self, db4e_rec):
-        print(f"Db4E:set_data(): {db4e_rec}")
+    db4e_rec = reactive(dict, init=False)
 
-        rec_2_biz = {
-            'group': 'Db4E Group',
-            'install_dir': 'Install Directory',
-            'user': 'Db4E User',
-            'user_wallet': 'Monero Wallet',
-            'vendor_dir': 'Deployment Directory'
-        }
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Health check name -> result, see set_health()
+        self.health = {}
 
-        db4e_user_name = rec_2_biz['user']
-        db4e_user = db4e_rec['user']
-        db4e_group_name = rec_2_biz['group']
-        db4e_group = db4e_rec['group']
-        install_dir_name = rec_2_biz['install_dir']
-        install_dir = db4e_rec['install_dir']
-        vendor_dir_name = rec_2_biz['vendor_dir']
-        vendor_dir = db4e_rec['vendor_dir']
-        user_wallet_name = rec_2_biz['user_wallet']
-        user_wallet = db4e_rec['user_wallet']
-
-        md = Vertical(
+    def compose(self) -> ComposeResult:
+        # Composed once, set_data() only updates the values
+        yield Vertical(
             MarkdownViewer(STATIC_CONTENT, show_table_of_contents=False, classes="form_intro"),
 
             Vertical(
                 Horizontal(
-                    Label(db4e_user_name, id="db4e_user_name_label"),
-                    Label(db4e_user, id="db4e_user")),
+                    Label(REC_2_BIZ['user'], id="db4e_user_name_label"),
+                    Label("", id="db4e_user")),
                 Horizontal(
-                    Label(db4e_group_name, id="db4e_group_name_label"),
-                    Label(db4e_group, id="db4e_group")),
+                    Label(REC_2_BIZ['group'], id="db4e_group_name_label"),
+                    Label("", id="db4e_group")),
                 Horizontal(
-                    Label(install_dir_name, id="db4e_install_dir_name_label"),
-                    Label(install_dir, id="install_dir")),
+                    Label(REC_2_BIZ['install_dir'], id="db4e_install_dir_name_label"),
+                    Label("", id="install_dir")),
                 Horizontal(
-                    Label(vendor_dir_name, id="db4e_vendor_dir_name_label"),
-                    Input(restrict=r"/[a-zA-Z0-9/_.\- ]*", value=vendor_dir, compact=True, id="db4e_vendor_dir_input")),
+                    Label(REC_2_BIZ['vendor_dir'], id="db4e_vendor_dir_name_label"),
+                    Input(restrict=r"/[a-zA-Z0-9/_.\- ]*", compact=True, id="db4e_vendor_dir_input")),
                 Horizontal(
-                    Label(user_wallet_name, id="db4e_user_wallet_name_label"),
-                    Input(restrict=r"[a-zA-Z0-9]*", value=user_wallet, compact=True, id="db4e_user_wallet_input")),
+                    Label(REC_2_BIZ['user_wallet'], id="db4e_user_wallet_name_label"),
+                    Input(restrict=r"[a-zA-Z0-9]*", compact=True, id="db4e_user_wallet_input")),
                 id="db4e_update_form"),
 
-            Button(label="Update", id="db4e_update_button"))
-        self.mount(md)
+            Button(label="Update", id="db4e_update_button"),
+
+            # Filled in by set_health() as the health probes finish
+            Static(id="db4e_health"))
+
+    def clear_health(self):
+        self.health = {}
+        self.show_health()
+
+    def on_mount(self) -> None:
+        # set_data() and set_health() may have been called before the form was composed
+        self.patch_form({}, self.db4e_rec)
+        self.show_health()
+
+    def patch_form(self, old_rec, new_rec):
+        # Only the fields whose values changed are touched
+        for field, widget_id in FIELD_WIDGETS.items():
+            value = new_rec.get(field, "")
+            if old_rec.get(field, "") == value:
+                continue
+            widget = self.query_one(f"#{widget_id}")
+            if isinstance(widget, Input):
+                widget.value = value
+            else:
+                widget.update(value)
+
+    def set_health(self, name, result):
+        self.health[name] = result
+        self.show_health()
+
+    def show_health(self):
+        # Rendered by on_mount() if the pane isn't mounted yet
+        if not self.is_mounted:
+            return
+        if not self.health:
+            self.query_one("#db4e_health", Static).update("")
+            return
+        table = Table(show_header=False, box=box.SIMPLE)
+        table.add_column("Check", width=25)
+        table.add_column("Result")
+        for check, result in self.health.items():
+            if result["state"] == "good":
+                table.add_row(f"✅ [green]{check}[/]", f"[green]{result['msg']}[/]")
+            else:
+                table.add_row(f"⚠️  [yellow]{check}[/]", f"[yellow]{result['msg']}[/]")
+        self.query_one("#db4e_health", Static).update(table)
+
+    def set_data(self, db4e_rec):
+        print(f"Db4E:set_data(): {db4e_rec}")
+        # The watcher isn't called if the record didn't change
+        self.db4e_rec = { field: db4e_rec[field] for field in REC_2_BIZ }
+
+    def watch_db4e_rec(self, old_rec, new_rec):
+        if self.is_mounted:
+            self.patch_form(old_rec, new_rec)
 
     async def on_button_pressed(self, event: Button.Pressed) -> None:
         form_data = {
             "to_module": "DeploymentMgr",
             "to_method": "update_deployment",
-            "user_wallet": self.query_one("#initial_setup_user_wallet_input", Input).value,
-            "vendor_dir": self.query_one("#initial_setup_vendor_dir_input", Input).value,
+            "user_wallet": self.query_one("#db4e_user_wallet_input", Input).value,
+            "vendor_dir": self.query_one("#db4e_vendor_dir_input", Input).value,
         }
         self.app.post_message(SubmitFormData(self, form_data))
 
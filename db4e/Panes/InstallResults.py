@@ -16,13 +16,36 @@ from db4e.Messages.RefreshNavPane import RefreshNavPane
 
 class InstallResults(Container):
 
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # The finished steps, shown by on_mount() if they came in earlier
+        self.task_list = []
+
+    def compose(self) -> ComposeResult:
+        # Composed once, the table is replaced as the results come in
+        yield Static(id="install_results_table")
+
+    def on_mount(self) -> None:
+        self.show_table()
+
+    def add_result(self, task):
+        # One step of an install that's still running
+        self.task_list.append(task)
+        self.show_table()
+
     def set_data(self, task_list):
+        self.task_list = list(task_list)
+        self.show_table()
+        self.app.post_message(RefreshNavPane(self))
 
+    def show_table(self):
+        if not self.is_mounted:
+            return
         table = Table(show_header=True, header_style="bold cyan", style="bold green", box=box.SIMPLE)
         table.add_column("Component", width=25)
         table.add_column("Message")
 
-        for task in task_list:
+        for task in self.task_list:
             for category, msg_dict in task.items():
                 message = msg_dict["msg"]
                 if msg_dict["status"] == "good":
@@ -32,5 +55,8 @@ class InstallResults(Container):
                 elif msg_dict["status"] == "error":
                     table.add_row(f"💥 [red]{category}[/]", f"[red]{message}[/]")
 
-        self.mount(Static(table))
-        self.app.post_message(RefreshNavPane(self))
+        self.query_one("#install_results_table", Static).update(table)
+
+    def start_progress(self):
+        self.task_list = []
+        self.show_table()
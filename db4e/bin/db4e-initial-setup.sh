@@ -59,21 +59,25 @@ cp /etc/sudoers /etc/sudoers.db4e
 mv /tmp/sudoers /etc/sudoers
 echo "Updated /etc/sudoers, original is backed up as /etc/sudoers.db4e"
 
-# Install the db4e, P2Pool and Monerod systemd files
+# Install the db4e, P2Pool, Monerod and XMRig systemd files. Only the units
+# that changed are in the TMP_DIR (see db4e/Modules/TemplateRenderer.py),
+# systemd is only reloaded if there are any.
 TMP_DIR=/tmp/db4e
-mv $TMP_DIR/db4e.service /etc/systemd/system
-echo "Installed the db4e systemd service"
-mv $TMP_DIR/p2pool@.service /etc/systemd/system
-mv $TMP_DIR/p2pool@.socket /etc/systemd/system
-echo "Installed the P2Pool systemd service"
-mv $TMP_DIR/monerod@.service /etc/systemd/system
-mv $TMP_DIR/monerod@.socket /etc/systemd/system
-echo "Installed the Monero daemon systemd service"
-mv $TMP_DIR/xmrig@.service /etc/systemd/system
-echo "Installed the XMRig miner systemd service"
+UNITS_CHANGED=false
+for UNIT in db4e.service p2pool@.service p2pool@.socket monerod@.service monerod@.socket xmrig@.service; do
+    if [ -f "$TMP_DIR/$UNIT" ]; then
+        mv "$TMP_DIR/$UNIT" /etc/systemd/system
+        echo "Installed the $UNIT systemd unit"
+        UNITS_CHANGED=true
+    fi
+done
 
-systemctl daemon-reload
-echo "Reloaded the systemd configuration"
+if [ "$UNITS_CHANGED" = true ]; then
+    systemctl daemon-reload
+    echo "Reloaded the systemd configuration"
+else
+    echo "The systemd units are up to date"
+fi
 systemctl enable db4e
 echo "Configured the db4e service to start at boot time"
 systemctl start db4e
@@ -0,0 +1,23 @@
+import asyncio
+import time
+import pytest
+from db4e.Modules.AsyncDbMgr import AsyncDbMgr
+
+def test_call_and_timeout():
+    adb = AsyncDbMgr(db=None, timeout=0.2)
+    assert asyncio.run(adb.call(lambda x: x * 2, 21)) == 42
+    with pytest.raises(asyncio.TimeoutError):
+        asyncio.run(adb.call(time.sleep, 1))
+
+def test_cancel():
+    adb = AsyncDbMgr(db=None, timeout=5)
+    async def navigate_away():
+        task = asyncio.create_task(adb.call(time.sleep, 1))
+        await asyncio.sleep(0.05)
+        task.cancel()
+        start = time.monotonic()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        return time.monotonic() - start
+    # The event loop isn't held up by the cancelled call
+    assert asyncio.run(navigate_away()) < 0.5
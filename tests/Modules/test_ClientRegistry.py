@@ -0,0 +1,25 @@
+import time
+import pytest
+from db4e.Modules.ClientRegistry import close_clients, connect, get_client, is_online
+
+def test_shared_client(config):
+    config.config['db']['server_selection_timeout_ms'] = 500
+    client = get_client(config)
+    assert get_client(config) is client
+    assert client.options.server_selection_timeout == 0.5
+    close_clients()
+    assert get_client(config) is not client
+    close_clients()
+
+def test_connect_fails_fast(config):
+    # Nothing listens on port 1
+    config.config['db']['port'] = 1
+    start = time.monotonic()
+    assert not connect(config, budget=0.3)
+    assert time.monotonic() - start < 1
+    # Known to be down, no ping until retry_timeout has passed
+    start = time.monotonic()
+    assert not connect(config)
+    assert time.monotonic() - start < 0.1
+    assert not is_online(config)
+    close_clients()
@@ -0,0 +1,33 @@
+import logging
+import threading
+import pytest
+from db4e.Modules.Db4eLogger import Db4eDbLogHandler
+
+def record(level, msg):
+    return logging.makeLogRecord({'levelno': level, 'levelname': logging.getLevelName(level), 'msg': msg})
+
+def test_backpressure(config):
+    handler = Db4eDbLogHandler(config, queue_size=20, batch_size=5, flush_interval=0.05)
+    gate = threading.Event()
+    written = []
+    def write(batch):
+        # A slow database
+        gate.wait()
+        written.extend(batch)
+    handler._write = write
+
+    for i in range(50):
+        handler.emit(record(logging.DEBUG, f'debug {i}'))
+    for i in range(50):
+        handler.emit(record(logging.INFO, f'info {i}'))
+    stats = handler.stats()
+    assert stats['queue_depth'] <= 20
+    assert stats['sampled'] > 0
+    assert stats['dropped'] > 0
+
+    gate.set()
+    handler.close()
+    stats = handler.stats()
+    assert stats['queue_depth'] == 0
+    assert len(written) + stats['dropped'] + stats['sampled'] == 100
+    assert written[0]['message'] == 'debug 0'
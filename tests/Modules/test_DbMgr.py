@@ -1,7 +1,79 @@
 import pytest
+from pymongo.errors import ConnectionFailure, OperationFailure
 from db4e.Modules.DbMgr import DbMgr
 
 def test_configmgr_init(config):
     from db4e.Modules.DbMgr import DbMgr
     db_mgr = DbMgr(config)
     assert db_mgr is not None
+
+def test_buffered_uniq_inserts(config, mongodb):
+    from datetime import datetime
+    db_mgr = DbMgr(config)
+    col_name = 'test_bulk'
+    db_mgr.get_collection(col_name).drop()
+    inserted = []
+    for minute in [1, 2, 2, 3]:
+        jdoc = {'doc_type': 'share_found_event', 'timestamp': datetime(2025, 1, 1, 0, minute)}
+        db_mgr.buffer_uniq_by_timestamp(col_name, jdoc, on_insert=lambda m=minute: inserted.append(m))
+    assert db_mgr.flush() == 3
+    assert inserted == [1, 2, 3]
+    # Already in the database, nothing is written or reported twice
+    db_mgr.buffer_uniq_by_timestamp(col_name, {'doc_type': 'share_found_event', 'timestamp': datetime(2025, 1, 1, 0, 1)})
+    assert db_mgr.flush() == 0
+    assert db_mgr.get_collection(col_name).count_documents({}) == 3
+    db_mgr.get_collection(col_name).drop()
+
+def test_index_report(config, mongodb):
+    db_mgr = DbMgr(config)
+    # Applying the index specs again is a no-op
+    db_mgr.ensure_indexes()
+    for query_path, indexes in db_mgr.index_report().items():
+        assert indexes and 'COLLSCAN' not in indexes, query_path
+
+def test_lazy_init_db(config, mocker):
+    # MongoDB is down when the DbMgr is created and comes up later
+    mocker.patch.object(DbMgr, '_initialized', {})
+    online = mocker.patch('db4e.Modules.DbMgr.connect', return_value=False)
+    init_db = mocker.patch.object(DbMgr, 'init_db')
+    db_mgr = DbMgr(config)
+    # Fails fast while offline
+    with pytest.raises(ConnectionFailure):
+        db_mgr.get_collection('realtime')
+    assert init_db.call_count == 0
+    online.return_value = True
+    # Initialized before the first operation, and only once
+    db_mgr.get_collection('realtime')
+    db_mgr.get_collection('mining')
+    assert init_db.call_count == 1
+    assert db_mgr.ready
+
+def test_init_db_failure(config, mocker):
+    # The ping works but initializing the database doesn't, DbMgr runs offline
+    mocker.patch.object(DbMgr, '_initialized', {})
+    mocker.patch('db4e.Modules.DbMgr.connect', return_value=True)
+    mocker.patch.object(DbMgr, 'init_db', side_effect=OperationFailure('not authorized'))
+    set_offline = mocker.patch('db4e.Modules.DbMgr.set_offline')
+    db_mgr = DbMgr(config)
+    assert not db_mgr.ready
+    assert set_offline.called
+
+def test_log_ttl(config, mongodb):
+    config.config['db']['log_collection'] = 'test_logging'
+    db_mgr = DbMgr(config)
+    db_mgr.db4e.drop_collection('test_logging')
+    ttl_indexes = lambda: [ index for index in db_mgr.get_collection('test_logging').index_information().values()
+                            if index['key'] == [('timestamp', 1)] ]
+    # Created
+    db_mgr.ensure_log_ttl()
+    assert [ index['expireAfterSeconds'] for index in ttl_indexes() ] == [7 * 24 * 60 * 60]
+    # Resized when the setting changes, not duplicated
+    db_mgr.log_retention = 1
+    db_mgr.ensure_log_ttl()
+    assert [ index['expireAfterSeconds'] for index in ttl_indexes() ] == [24 * 60 * 60]
+    # A regular index written by an older version becomes the TTL index
+    db_mgr.db4e.drop_collection('test_logging')
+    db_mgr.get_collection('test_logging').create_index('timestamp')
+    db_mgr.ensure_log_ttl()
+    assert [ index.get('expireAfterSeconds') for index in ttl_indexes() ] == [24 * 60 * 60]
+    db_mgr.db4e.drop_collection('test_logging')
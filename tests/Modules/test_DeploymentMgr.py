@@ -1,6 +1,50 @@
+import os
+import time
 import pytest
 from db4e.Modules.DeploymentMgr import DeploymentMgr
 
 def test_configmgr_init(config):
     depl_mgr = DeploymentMgr(config)
     assert depl_mgr is not None
+
+def test_deployment_cache(config, mocker, mongodb):
+    depl_mgr = DeploymentMgr(config)
+    depl_mgr.invalidate()
+    find_one = mocker.spy(depl_mgr.db, 'find_one')
+    depl_mgr.is_initialized()
+    depl_mgr.get_deployment('db4e')
+    assert find_one.call_count == 1
+    # Writes invalidate the cache of every DeploymentMgr
+    DeploymentMgr(config).invalidate()
+    depl_mgr.is_initialized()
+    assert find_one.call_count == 2
+
+def test_offline_snapshot(config, tmp_path):
+    # Nothing listens on port 1, the records come from the snapshot
+    config.config['db']['port'] = 1
+    start = time.monotonic()
+    depl_mgr = DeploymentMgr(config)
+    depl_mgr.invalidate()
+    assert depl_mgr.snapshot_file == str(tmp_path / 'deployments.json')
+    assert not depl_mgr.is_initialized()
+    depl_mgr._save_snapshot(('db4e', None), {
+        'component': 'db4e', 'group': 'db4e', 'install_dir': '/opt/db4e', 'user': 'db4e',
+        'user_wallet': '4xyz', 'vendor_dir': '/opt/vendor'})
+    assert depl_mgr.is_initialized()
+    assert depl_mgr.get_deployment('db4e')['install_dir'] == '/opt/db4e'
+    assert time.monotonic() - start < 3
+
+def test_snapshot_written_on_change(config, mocker):
+    depl_mgr = DeploymentMgr(config)
+    replace = mocker.spy(os, 'replace')
+    rec = {'component': 'p2pool', 'instance': 'main', 'enable': True}
+    depl_mgr._save_snapshot(('p2pool', 'main'), rec)
+    # Cache misses for an unchanged record don't touch the file
+    for _ in range(5):
+        depl_mgr._save_snapshot(('p2pool', 'main'), dict(rec))
+    assert replace.call_count == 1
+    depl_mgr._save_snapshot(('p2pool', 'main'), dict(rec, enable=False))
+    assert replace.call_count == 2
+    # Read back from the file
+    mocker.patch.object(DeploymentMgr, '_snapshots', {})
+    assert depl_mgr._load_snapshot()['p2pool/main']['enable'] is False
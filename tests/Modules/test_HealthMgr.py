@@ -0,0 +1,56 @@
+import time
+import socket
+import asyncio
+import pytest
+from db4e.Modules.HealthMgr import HealthMgr, GOOD, WARNING
+
+@pytest.fixture
+def health_mgr(config, mocker):
+    mocker.patch('db4e.Modules.HealthMgr.SystemdMgr')
+    return HealthMgr(config, probe_timeout=0.5)
+
+def test_probes_stream(health_mgr, tmp_path):
+    listener = socket.socket()
+    listener.bind(('127.0.0.1', 0))
+    listener.listen()
+    port = listener.getsockname()[1]
+    slow_calls = []
+
+    # A remote monerod that doesn't answer on its ZMQ port
+    async def probe_port(ip_addr, port_num):
+        if port_num == 18083:
+            slow_calls.append(port_num)
+            await asyncio.sleep(10)
+        return await HealthMgr.probe_port(health_mgr, ip_addr, port_num)
+    health_mgr.probe_port = probe_port
+
+    depl = {'component': 'monerod', 'instance': 'remote', 'remote': True,
+            'ip_addr': '127.0.0.1', 'rpc_bind_port': port, 'zmq_pub_port': 18083}
+
+    async def run():
+        start = time.monotonic()
+        results = []
+        async for name, result in health_mgr.check(depl):
+            results.append((name, result['state'], time.monotonic() - start))
+        return results
+
+    results = asyncio.run(run())
+    listener.close()
+    # The RPC port result came in right away, the ZMQ port timed out
+    assert results[0][:2] == ('RPC Port', GOOD)
+    assert results[0][2] < 0.3
+    assert results[1][:2] == ('ZMQ Port', WARNING)
+    assert results[1][2] < 1
+
+    # Cached
+    assert asyncio.run(health_mgr.check_all(depl))['ZMQ Port']['state'] == WARNING
+    assert len(slow_calls) == 1
+
+def test_dir_and_service(health_mgr, tmp_path):
+    health_mgr.systemd.status.return_value.installed = True
+    health_mgr.systemd.status.return_value.active = False
+    depl = {'install_dir': str(tmp_path), 'vendor_dir': str(tmp_path / 'missing')}
+    results = asyncio.run(health_mgr.check_all(depl))
+    assert results['Install Directory']['state'] == GOOD
+    assert results['Deployment Directory']['state'] == WARNING
+    assert results['Service']['msg'] == 'The db4e service is stopped'
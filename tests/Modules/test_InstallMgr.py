@@ -1,7 +1,65 @@
+import os
+import asyncio
+import threading
 import pytest
-from db4e.Modules.InstallMgr import InstallMgr
+from pymongo.errors import AutoReconnect
+from db4e.Modules.InstallMgr import InstallMgr, copy_file, file_checksum
 
 def test_configmgr_init(config):
     from db4e.Modules.InstallMgr import InstallMgr
     install_mgr = InstallMgr(config)
     assert install_mgr is not None
+
+def test_setup_db_off_loop(config, tmp_path, mocker):
+    install_mgr = InstallMgr(config)
+    threads = []
+    def get_deployment(component):
+        threads.append(threading.current_thread())
+        raise AutoReconnect('connection refused')
+    mocker.patch.object(install_mgr.depl_mgr, 'get_deployment', side_effect=get_deployment)
+    form_data = {'user_wallet': '48aTDJfRH2JLc', 'db4e_group': 'db4e', 'vendor_dir': str(tmp_path / 'db4e')}
+    results = asyncio.run(install_mgr.initial_setup(form_data))
+    # Not run on the event loop, the install is aborted with an error
+    assert threads and threads[0] is not threading.main_thread()
+    assert results[-1]['Db4E core']['status'] == 'error'
+    assert not (tmp_path / 'db4e').exists()
+
+def test_failed_installer_resumes(config, tmp_path, mocker):
+    config.config['db4e'].update({'bin_dir': 'bin', 'db4e_dir': 'db4e', 'setup_script': 'db4e-initial-setup.sh'})
+    install_mgr = InstallMgr(config)
+    mocker.patch.object(install_mgr.depl_mgr, 'get_deployment', return_value=None)
+    mocker.patch.object(install_mgr.depl_mgr, 'add_deployment')
+    mocker.patch.object(install_mgr.depl_mgr, 'update_deployent')
+    # Nothing to stage, and not the real /tmp/db4e
+    mocker.patch.object(install_mgr, 'staging_plan', return_value=([], [], []))
+    mocker.patch.object(install_mgr, 'make_dirs')
+    mocker.patch.object(install_mgr, 'render_step', return_value={'Systemd units': {'status': 'good', 'msg': ''}})
+    run = mocker.patch('db4e.Modules.InstallMgr.subprocess.run')
+    run.return_value.returncode = 1
+    run.return_value.stdout = b''
+    run.return_value.stderr = b'sudo: a password is required'
+    vendor_dir = tmp_path / 'db4e'
+    form_data = {'user_wallet': '48aTDJfRH2JLc', 'db4e_group': 'db4e', 'vendor_dir': str(vendor_dir)}
+    results = asyncio.run(install_mgr.initial_setup(form_data))
+    assert results[-1]['Db4E core']['status'] == 'error'
+    # The next attempt resumes instead of backing up the deployment directory
+    assert (vendor_dir / '.db4e-staging').exists()
+    results = asyncio.run(install_mgr.initial_setup(form_data))
+    assert 'Resuming' in results[0]['Deployment directory']['msg']
+    assert [ path.name for path in tmp_path.iterdir() ] == ['db4e']
+
+def test_copy_file(tmp_path):
+    src = tmp_path / 'p2pool'
+    src.write_bytes(os.urandom(3 * 1024 * 1024))
+    src.chmod(0o755)
+    dst = tmp_path / 'bin' / 'p2pool'
+    dst.parent.mkdir()
+    assert copy_file(str(src), str(dst)) in ('reflink', 'copy_file_range', 'sendfile', 'read/write')
+    assert dst.read_bytes() == src.read_bytes()
+    assert os.stat(dst).st_mode == os.stat(src).st_mode
+    # Already in place
+    assert copy_file(str(src), str(dst)) == 'unchanged'
+    # A partial copy is redone
+    dst.write_bytes(src.read_bytes()[:1000])
+    assert copy_file(str(src), str(dst)) != 'unchanged'
+    assert file_checksum(str(dst)) == file_checksum(str(src))
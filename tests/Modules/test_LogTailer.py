@@ -0,0 +1,104 @@
+import os
+import time
+import threading
+import pytest
+from db4e.Modules.LogTailer import LogTailer, InotifyWatcher
+
+def follow(tailer):
+    lines = []
+    def run():
+        for line in tailer.follow():
+            lines.append(line)
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    return lines, thread
+
+def wait_for(lines, count, timeout=5):
+    deadline = time.monotonic() + timeout
+    while len(lines) < count and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return lines
+
+@pytest.mark.parametrize("use_inotify", [True, False])
+def test_follow_rotate_truncate(tmp_path, use_inotify):
+    log_file = tmp_path / "p2pool.log"
+    log_file.write_text("old line\n")
+    tailer = LogTailer(str(log_file), poll_interval=0.05, use_inotify=use_inotify)
+    if use_inotify:
+        assert isinstance(tailer.watcher, InotifyWatcher)
+    lines, thread = follow(tailer)
+    time.sleep(0.1)
+
+    with open(log_file, "a") as f:
+        f.write("one\ntw")
+        f.flush()
+        time.sleep(0.1)
+        f.write("o\n")
+    assert wait_for(lines, 2) == ["one\n", "two\n"]
+
+    # Rename and recreate, the tail of the old file is not lost
+    with open(log_file, "a") as f:
+        f.write("three\n")
+    os.rename(log_file, tmp_path / "p2pool.log.1")
+    log_file.write_text("four\n")
+    assert wait_for(lines, 4)[2:] == ["three\n", "four\n"]
+
+    # Truncate in place
+    with open(log_file, "w") as f:
+        f.write("")
+    time.sleep(0.1)
+    with open(log_file, "a") as f:
+        f.write("five\n")
+    assert wait_for(lines, 5)[4:] == ["five\n"]
+
+    tailer.stop()
+    thread.join(timeout=5)
+    assert not thread.is_alive()
+
+def test_rotate_drains_old_file(tmp_path):
+    log_file = tmp_path / "p2pool.log"
+    log_file.write_text("one\n")
+    tailer = LogTailer(str(log_file), offset=0, poll_interval=0.05, use_inotify=False)
+    rotated = tailer._rotated
+
+    # The writer adds a line and the log is rotated right after the
+    # tailer caught up, but before it checks for a rotation
+    def late_rotate():
+        if not (tmp_path / "p2pool.log.1").exists():
+            with open(log_file, "a") as f:
+                f.write("late\n")
+            os.rename(log_file, tmp_path / "p2pool.log.1")
+            log_file.write_text("new\n")
+        return rotated()
+    tailer._rotated = late_rotate
+
+    lines = tailer.follow()
+    assert [next(lines), next(lines), next(lines)] == ["one\n", "late\n", "new\n"]
+    lines.close()
+
+def test_resume_from_checkpoint(tmp_path):
+    log_file = tmp_path / "p2pool.log"
+    log_file.write_text("one\ntwo\n")
+    inode = os.stat(log_file).st_ino
+    with open(log_file, "a") as f:
+        f.write("three\n")
+
+    # Same file, pick up right after the checkpoint
+    tailer = LogTailer(str(log_file), offset=4, inode=inode, poll_interval=0.05, use_inotify=False)
+    lines, thread = follow(tailer)
+    assert wait_for(lines, 2) == ["two\n", "three\n"]
+    tailer.stop()
+    thread.join(timeout=5)
+    assert tailer.position() == (inode, 14)
+
+    # Rotated while the tailer was down, the old file is finished first
+    os.rename(log_file, tmp_path / "p2pool.log.1")
+    with open(tmp_path / "p2pool.log.1", "a") as f:
+        f.write("four\n")
+    log_file.write_text("five\n")
+    tailer = LogTailer(str(log_file), offset=14, inode=inode, poll_interval=0.05, use_inotify=False)
+    lines, thread = follow(tailer)
+    assert wait_for(lines, 2) == ["four\n", "five\n"]
+    tailer.stop()
+    thread.join(timeout=5)
+    assert tailer.position() == (os.stat(log_file).st_ino, 5)
@@ -0,0 +1,120 @@
+import threading
+import pytest
+from datetime import datetime, timezone
+from bson.decimal128 import Decimal128
+from pymongo.errors import DuplicateKeyError
+from db4e.Modules.MiningDb import MiningDb
+
+@pytest.fixture
+def mining_db(config):
+    config.config['db'].update({
+        'collection': 'test_mining',
+        'metrics_collection': 'test_metrics',
+        'rt_collection': 'test_realtime',
+        'rt_samples': 5,
+    })
+    return MiningDb(config)
+
+@pytest.fixture
+def live_db(mining_db, mongodb):
+    # Fresh collections, created the way init_db() creates them
+    for col_name in ['test_mining', 'test_metrics', 'test_realtime']:
+        mining_db.db.db4e.drop_collection(col_name)
+    mining_db.db.metrics_timeseries = False
+    mining_db.db.init_db()
+    yield mining_db
+    for col_name in ['test_mining', 'test_metrics', 'test_realtime']:
+        mining_db.db.db4e.drop_collection(col_name)
+
+def test_duplicate_upsert_retried(mining_db, mocker):
+    # The upsert that lost the race is retried, it updates the winner's record
+    update_one = mocker.patch.object(mining_db.db, 'update_one',
+                                     side_effect=[DuplicateKeyError('E11000'), None])
+    mining_db.add_sidechain_miners(42)
+    assert update_one.call_count == 2
+    filter = update_one.call_args.args[1]
+    assert filter['doc_type'] == 'sidechain_miners'
+    assert 'worker_name' in filter and filter['worker_name'] is None
+
+def test_hourly_upserts(live_db):
+    for hashrate in [1000.0, 2000.0]:
+        live_db.add_pool_hashrate(hashrate)
+        live_db.update_worker('rig1', hashrate)
+        live_db.update_worker('rig2', hashrate)
+    col = live_db.db.get_collection('test_mining')
+    # One record per series and hour, the last value wins
+    assert col.count_documents({'doc_type': 'pool_hashrate'}) == 1
+    assert col.find_one({'doc_type': 'pool_hashrate'})['hashrate'] == 2000.0
+    assert col.count_documents({'doc_type': 'worker'}) == 2
+
+def test_add_to_wallet(live_db):
+    assert live_db.get_wallet_balance() == Decimal128('0')
+    live_db.add_to_wallet(Decimal128('0.000123456789'))
+    live_db.add_to_wallet(Decimal128('1.5'))
+    assert live_db.get_wallet_balance().to_decimal() == Decimal128('1.500123456789').to_decimal()
+    col = live_db.db.get_collection('test_mining')
+    assert col.count_documents({'doc_type': 'wallet_balance'}) == 1
+
+def test_migrate_metrics(live_db):
+    hour = lambda h: datetime(2025, 1, 1, h, tzinfo=timezone.utc)
+    mining = live_db.db.get_collection('test_mining')
+    mining.insert_many(
+        [{'doc_type': 'pool_hashrate', 'timestamp': hour(h), 'hashrate': 1000.0 * h} for h in range(1, 4)] +
+        [{'doc_type': 'worker', 'timestamp': hour(1), 'worker_name': 'rig1', 'hashrate': 500.0, 'active': True}])
+    # Enabled later, a sample is written before the monitor restarts
+    live_db.db.metrics_timeseries = True
+    live_db.add_pool_hashrate(4000.0)
+    assert live_db.migrate_metrics() == 4
+    # Only once
+    assert live_db.migrate_metrics() == 0
+    pipeline = [{'$sort': {'timestamp': 1}}]
+    hashrates = [ doc['hashrate'] for doc in live_db.aggregate_metrics('pool_hashrate', pipeline) ]
+    assert hashrates == [1000.0, 2000.0, 3000.0, 4000.0]
+    assert live_db.get_workers()['rig1']['hashrate'] == 500.0
+
+def test_migrate_hashrates(live_db):
+    hour = lambda h: datetime(2025, 1, 1, h, tzinfo=timezone.utc)
+    mining = live_db.db.get_collection('test_mining')
+    mining.insert_many([
+        {'doc_type': 'pool_hashrate', 'timestamp': hour(1), 'hashrate': '6.889 KH/s'},
+        {'doc_type': 'sidechain_hashrate', 'timestamp': hour(1), 'hashrate': '12.5 MH/s'},
+        {'doc_type': 'worker', 'timestamp': hour(1), 'worker_name': 'rig1', 'hashrate': '512 H/s'},
+        {'doc_type': 'mainchain_hashrate', 'timestamp': hour(1), 'hashrate': 2.5e9},
+        # Skipped, left as they are
+        {'doc_type': 'pool_hashrate', 'timestamp': hour(2), 'hashrate': 'n/a'},
+        {'doc_type': 'pool_hashrate', 'timestamp': hour(3), 'hashrate': '1.5 XH/s'},
+        {'doc_type': 'pool_hashrate', 'timestamp': hour(4), 'hashrate': 'fast KH/s'},
+    ])
+    assert live_db.migrate_hashrates() == 3
+    hashrate = lambda doc_type, h: mining.find_one({'doc_type': doc_type, 'timestamp': hour(h)})['hashrate']
+    assert hashrate('pool_hashrate', 1) == pytest.approx(6889.0)
+    assert hashrate('sidechain_hashrate', 1) == pytest.approx(12.5e6)
+    assert hashrate('worker', 1) == 512.0
+    assert hashrate('mainchain_hashrate', 1) == 2.5e9
+    assert [ hashrate('pool_hashrate', h) for h in (2, 3, 4) ] == ['n/a', '1.5 XH/s', 'fast KH/s']
+    # Already converted
+    assert live_db.migrate_hashrates() == 0
+
+def test_rt_ring_buffer(live_db):
+    # rt_samples is 5, the capped collection holds 5 samples of each of the 4 series
+    for position in range(25):
+        live_db.add_share_position(position)
+    assert live_db.db.get_collection('test_realtime').count_documents({}) == 20
+    assert [ sample['position'] for sample in live_db.get_rt_history('share_position', 3) ] == [22, 23, 24]
+    assert [ sample['position'] for sample in live_db.get_rt_history('share_position', 30) ] == list(range(5, 25))
+    assert live_db.get_rt_record('share_position')['position'] == 24
+
+def test_follow_rt(live_db):
+    live_db.add_share_position(1)
+    live_db.add_pool_hashrate(1000.0)
+    # Only the samples written after follow_rt() started, of the given series
+    def write():
+        live_db.add_share_position(2)
+        live_db.add_sidechain_hashrate(2000.0)
+        live_db.add_share_position(3)
+    timer = threading.Timer(0.5, write)
+    timer.start()
+    samples = live_db.follow_rt(['share_position'])
+    assert [ next(samples)['position'], next(samples)['position'] ] == [2, 3]
+    samples.close()
+    timer.join()
@@ -0,0 +1,72 @@
+import pytest
+from datetime import datetime
+from decimal import Decimal
+from bson.decimal128 import Decimal128
+from db4e.Modules.MiningReports import MiningReports, REPORTS
+
+def test_payment_rollups(config, tmp_path, mongodb):
+    config.config['db']['collection'] = 'test_reports'
+    reports = MiningReports(config, str(tmp_path))
+    col = reports.db.db.get_collection('test_reports')
+    col.delete_many({})
+    col.insert_many([
+        {'doc_type': 'xmr_payment', 'timestamp': datetime(2025, 1, day, hour), 'payment': Decimal128('0.001')}
+        for day, hour in [(1, 1), (1, 2), (2, 1), (2, 2), (2, 3), (2, 4)]])
+    daily, cumulative = REPORTS['payments']
+    assert reports.get_rows(daily) == [
+        [datetime(2025, 1, 1), Decimal('0.0020')], [datetime(2025, 1, 2), Decimal('0.0040')]]
+    assert reports.get_rows(cumulative)[-1] == [datetime(2025, 1, 2), Decimal('0.0060')]
+    reports.run('payments')
+    assert (tmp_path / 'csv' / 'payments' / 'daily-payment-60days.csv').read_text().splitlines() == [
+        'Date,Total', '2025-01-01 00:00:00,0.0020', '2025-01-02 00:00:00,0.0040']
+    col.drop()
+
+def test_incremental_update(config, tmp_path, mongodb):
+    config.config['db']['collection'] = 'test_reports'
+    reports = MiningReports(config, str(tmp_path))
+    col = reports.db.db.get_collection('test_reports')
+    col.delete_many({})
+    payment = lambda day, hour: {'doc_type': 'xmr_payment', 'timestamp': datetime(2025, 1, day, hour), 'payment': Decimal128('0.001')}
+    col.insert_many([payment(1, 1), payment(2, 1)])
+    reports.update('payments')
+    col.insert_many([payment(2, 2), payment(3, 1)])
+    reports.update('payments')
+    csv_dir = tmp_path / 'csv' / 'payments'
+    assert (csv_dir / 'cumulative-payment.csv').read_text().splitlines() == [
+        'Date,Total', '2025-01-01 00:00:00,0.0010', '2025-01-02 00:00:00,0.0030', '2025-01-03 00:00:00,0.0040']
+    assert (csv_dir / 'daily-payment-180days.csv').read_text() == (csv_dir / 'daily-payment.csv').read_text()
+    col.drop()
+
+def test_cumulative_update_exact(config, tmp_path, mongodb):
+    # Small payments, the rounded CSV values must not add up to a drift
+    config.config['db']['collection'] = 'test_reports'
+    reports = MiningReports(config, str(tmp_path))
+    col = reports.db.db.get_collection('test_reports')
+    col.delete_many({})
+    for day in range(1, 11):
+        col.insert_one({'doc_type': 'xmr_payment', 'timestamp': datetime(2025, 1, day, 1), 'payment': Decimal128('0.00004')})
+        reports.update('payments')
+    incremental = (tmp_path / 'csv' / 'payments' / 'cumulative-payment.csv').read_text()
+    reports.run('payments')
+    assert (tmp_path / 'csv' / 'payments' / 'cumulative-payment.csv').read_text() == incremental
+    assert incremental.splitlines()[-1] == '2025-01-10 00:00:00,0.0004'
+    col.drop()
+
+def test_scheduler_debounces_bursts():
+    import time
+    from db4e.Modules.MiningReports import ReportScheduler
+    class FakeReports:
+        def __init__(self):
+            self.updates = []
+        def update(self, reports_name):
+            self.updates.append(reports_name)
+    reports = FakeReports()
+    scheduler = ReportScheduler(reports, delay=0.2, max_delay=1)
+    for _ in range(20):
+        scheduler.schedule('sharesfound')
+    scheduler.schedule('payments')
+    time.sleep(0.5)
+    assert sorted(reports.updates) == ['payments', 'sharesfound']
+    scheduler.schedule('blocksfound')
+    scheduler.stop()
+    assert reports.updates[-1] == 'blocksfound'
@@ -0,0 +1,56 @@
+import pytest
+from datetime import datetime
+from db4e.Modules.P2PoolLogParser import (
+    P2PoolLogParser, parse_hashrate, BLOCK_FOUND, MAINCHAIN_HASHRATE, POOL_HASHRATE, SHARE_FOUND,
+    SHARE_POSITION, SIDECHAIN_HASHRATE, WORKER_STATS, XMR_PAYMENT, NO_SHARES_POSITION)
+
+@pytest.fixture
+def parser():
+    return P2PoolLogParser()
+
+def test_block_found(parser):
+    event = parser.classify("NOTICE  2024-11-09 19:52:19.1734 P2Pool BLOCK FOUND: main chain block at height 3277801 was mined by someone else in this p2pool\n")
+    assert event.event == BLOCK_FOUND
+    assert event.data == {'timestamp': datetime(2024, 11, 9, 19, 52)}
+
+def test_hashrates(parser):
+    assert parser.classify("Main chain hashrate       = 3.105 GH/s\n").data == {'hashrate': 3105000000.0}
+    assert parser.classify("Side chain hashrate       = 12.291 MH/s").event == SIDECHAIN_HASHRATE
+    event = parser.classify("Hashrate (1h  est)   = 7.384 KH/s")
+    assert event.event == POOL_HASHRATE
+    assert event.data == {'hashrate': 7384.0}
+
+def test_parse_hashrate():
+    assert parse_hashrate('788 H/s') == 788.0
+    assert parse_hashrate('6.889 KH/s') == 6889.0
+    assert parse_hashrate('12.291 MH/s') == 12291000.0
+
+def test_share_found(parser):
+    event = parser.classify("2024-11-10 00:47:47.5596 StratumServer SHARE FOUND: mainchain height 3277956, sidechain height 9143872, diff 126624856, client 192.168.0.86:37294, user sally, effort 91.663%")
+    assert event.event == SHARE_FOUND
+    assert event.data['worker'] == 'sally'
+    assert event.data['ip_addr'] == '192.168.0.86'
+    assert event.data['effort'] == 91.663
+
+def test_share_position(parser):
+    event = parser.classify("Your shares position      = [.........................1....]")
+    assert event.event == SHARE_POSITION
+    assert event.data == {'position': '[.........................1....]'}
+    event = parser.classify("Your shares               = 0 blocks (+0 uncles, 0 orphans)")
+    assert event.data == {'position': NO_SHARES_POSITION}
+
+def test_worker_stats(parser):
+    event = parser.classify("2024-11-09 20:05:01.4647 StratumServer 192.168.0.27:57888         no     14h 59m 52s         23666               1.788 KH/s        paris\n")
+    assert event.event == WORKER_STATS
+    assert event.data == {'worker_name': 'paris', 'hashrate': 1788}
+    event = parser.classify("2024-11-09 20:05:01.4647 StratumServer 192.168.0.27:57888         no     14h 59m 52s         23666               788 H/s        paris")
+    assert event.data['hashrate'] == 788
+
+def test_xmr_payment(parser):
+    event = parser.classify("2025-06-02 21:42:53.0727 P2Pool Your wallet 48wdY6fDEG got a payout of 0.000295115076 XMR in block 3425427")
+    assert event.event == XMR_PAYMENT
+    assert str(event.data['payout']) == '0.000295115076'
+
+def test_unrelated_lines(parser):
+    assert parser.classify("2024-11-09 20:05:01.4647 P2PServer peer list updated") is None
+    assert parser.classify("Your hashrate (pool-side) = 13.137 KH/s") is None
@@ -1,4 +1,6 @@
+import asyncio
 import pytest
+from textual.app import App
 from db4e.Modules.PaneMgr import PaneMgr
 from db4e.Modules.PaneCatalogue import PaneCatalogue
 
@@ -8,3 +10,34 @@ def test_configmgr_init(config):
     pane_mgr = PaneMgr(config, catalogue, initialized_flag)
     
     assert pane_mgr is not None
+
+def test_lazy_panes(config):
+    config.config['db4e']['max_panes'] = 2
+
+    class PaneApp(App):
+        def compose(self):
+            self.pane_mgr = PaneMgr(config, PaneCatalogue(), True)
+            yield self.pane_mgr
+
+    async def run():
+        app = PaneApp()
+        async with app.run_test() as pilot:
+            pane_mgr = app.pane_mgr
+            # Only the initial pane is built
+            assert list(pane_mgr.panes) == ['Welcome']
+            await pane_mgr.set_pane('InitialSetup')
+            await pilot.pause()
+            assert list(pane_mgr.panes) == ['Welcome', 'InitialSetup']
+            await pane_mgr.set_pane('Welcome')
+            pane = await pane_mgr.set_pane('InstallResults')
+            # The pane is mounted by the time set_pane() returns
+            assert pane.is_mounted
+            assert pane.query_one('#install_results_table')
+            await pilot.pause()
+            # InitialSetup was the least recently used
+            assert list(pane_mgr.panes) == ['Welcome', 'InstallResults']
+            switcher = app.query_one('#content_switcher')
+            assert [ pane.id for pane in switcher.children ] == ['Welcome', 'InstallResults']
+            assert switcher.current == 'InstallResults'
+
+    asyncio.run(run())
@@ -0,0 +1,89 @@
+import time
+import threading
+import pytest
+from pymongo.errors import AutoReconnect, OperationFailure
+from db4e.Modules.Reconciler import Reconciler
+
+def deployment(instance, **kwargs):
+    return dict({'doc_type': 'deployment', 'component': 'p2pool', 'instance': instance,
+                 'enable': True, 'op': None, 'remote': False}, **kwargs)
+
+@pytest.fixture
+def reconciler(config, mocker):
+    mocker.patch('db4e.Modules.Reconciler.DeploymentMgr')
+    mocker.patch('db4e.Modules.Reconciler.SystemdMgr')
+    reconciler = Reconciler(config)
+    reconciler.systemd.active.return_value = False
+    reconciler.systemd.start.return_value = 0
+    yield reconciler
+    reconciler.executor.shutdown(wait=True)
+
+def test_enable_op(reconciler):
+    reconciler.submit(deployment('main', enable=False, op='enable'))
+    reconciler.executor.shutdown(wait=True)
+    reconciler.depl_mgr.update_deployment_instance.assert_any_call(
+        'p2pool', 'main', {'enable': True, 'op': None})
+    reconciler.systemd.start.assert_called_once_with('p2pool@main')
+
+def test_concurrent_and_coalesced(reconciler):
+    gate = threading.Event()
+    def start(unit):
+        gate.wait(1)
+        return 0
+    reconciler.systemd.start.side_effect = start
+    for i in range(5):
+        reconciler.submit(deployment('main', op=None, updated=i))
+    reconciler.submit(deployment('other'))
+    # Both deployments are being worked on at the same time
+    time.sleep(0.1)
+    assert reconciler.busy == {('p2pool', 'main'), ('p2pool', 'other')}
+    gate.set()
+    reconciler.executor.shutdown(wait=True)
+    # The burst for 'main' is collapsed into one more run with the latest record
+    units = [ call.args[0] for call in reconciler.systemd.start.call_args_list ]
+    assert units.count('p2pool@main') == 2
+    assert units.count('p2pool@other') == 1
+
+def test_poll_changes(reconciler):
+    depls = [deployment('main'), deployment('other')]
+    reconciler.depl_mgr.get_deployments.return_value = depls
+    assert reconciler.poll_changes() == 2
+    assert reconciler.poll_changes() == 0
+    depls[1] = deployment('other', op='disable')
+    assert reconciler.poll_changes() == 1
+    # The status written by the reconciler doesn't queue another run
+    depls[0] = deployment('main', status='running')
+    assert reconciler.poll_changes() == 0
+
+def test_poll_survives_db_errors(reconciler, mocker):
+    # A standalone mongod, then MongoDB goes away for one poll
+    mocker.patch.object(reconciler, 'watch', side_effect=OperationFailure('not a replica set'))
+    reconciler.poll_interval = 0.01
+    polls = []
+    def get_deployments(components):
+        polls.append(components)
+        if len(polls) == 2:
+            raise AutoReconnect('connection refused')
+        if len(polls) == 3:
+            reconciler.stopped.set()
+        return [deployment('main')]
+    reconciler.depl_mgr.get_deployments.side_effect = get_deployments
+    reconciler.run()
+    assert len(polls) == 3
+    # Resynced after the failed poll
+    units = [ call.args[0] for call in reconciler.systemd.start.call_args_list ]
+    assert units == ['p2pool@main', 'p2pool@main']
+
+def test_poll_retries_watch(reconciler, mocker):
+    # The change stream is tried again after a resync interval of polling
+    mocker.patch('db4e.Modules.Reconciler.RESYNC_INTERVAL', 0.05)
+    reconciler.poll_interval = 0.01
+    watch = mocker.patch.object(reconciler, 'watch')
+    reconciler.depl_mgr.get_deployments.return_value = []
+    def stop():
+        if watch.call_count >= 3:
+            reconciler.stopped.set()
+        raise OperationFailure('not a replica set')
+    watch.side_effect = stop
+    reconciler.run()
+    assert watch.call_count == 3
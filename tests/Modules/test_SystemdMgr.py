@@ -0,0 +1,46 @@
+import os
+import json
+import pytest
+from db4e.Modules.SystemdMgr import SystemdMgr
+
+FAKE_SYSTEMCTL = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'bin', 'systemctl')
+
+UNITS = {
+    'db4e.service': {'LoadState': 'loaded', 'ActiveState': 'active', 'SubState': 'running',
+                     'UnitFileState': 'enabled', 'MainPID': '1234'},
+    'p2pool@main.service': {'LoadState': 'loaded', 'ActiveState': 'active', 'SubState': 'running',
+                            'UnitFileState': 'enabled', 'MainPID': '2345'},
+    'xmrig@rig1.service': {'LoadState': 'loaded', 'ActiveState': 'failed', 'SubState': 'failed',
+                           'UnitFileState': 'disabled', 'MainPID': '0'},
+    'sshd.service': {'LoadState': 'loaded', 'ActiveState': 'active', 'SubState': 'running',
+                     'UnitFileState': 'enabled', 'MainPID': '99'},
+}
+
+@pytest.fixture
+def systemctl_log(tmp_path, monkeypatch):
+    units_file = tmp_path / 'units.json'
+    units_file.write_text(json.dumps(UNITS))
+    log_file = tmp_path / 'systemctl.log'
+    log_file.write_text('')
+    monkeypatch.setenv('FAKE_SYSTEMCTL_UNITS', str(units_file))
+    monkeypatch.setenv('FAKE_SYSTEMCTL_LOG', str(log_file))
+    return log_file
+
+def test_one_call_per_tick(config, systemctl_log):
+    systemd = SystemdMgr(config, systemctl=FAKE_SYSTEMCTL)
+    assert systemd.active('db4e')
+    assert systemd.pid('db4e') == 1234
+    assert systemd.enabled('p2pool@main')
+    assert not systemd.active('xmrig@rig1')
+    assert systemd.pid('xmrig@rig1') is None
+    assert systemd.enabled('xmrig@rig1') is False
+    # Unknown and unrelated units
+    assert not systemd.installed('monerod@main')
+    assert not systemd.installed('sshd')
+    calls = systemctl_log.read_text().splitlines()
+    assert len(calls) == 1
+    assert calls[0].startswith('show')
+
+    systemd.invalidate()
+    assert systemd.installed('xmrig@rig1')
+    assert len(systemctl_log.read_text().splitlines()) == 2
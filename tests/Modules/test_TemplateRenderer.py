@@ -0,0 +1,45 @@
+import os
+import pytest
+from db4e.Modules.TemplateRenderer import Template, get_template, render_units
+
+SERVICE = 'ExecStart=[[P2POOL_DIR]]/bin/start-p2pool.sh [[P2POOL_DIR]]/conf/%i.ini\nUser=[[DB4E_USER]]\n'
+VALUES = {'P2POOL_DIR': '/opt/db4e/p2pool-4.8', 'DB4E_USER': 'sally'}
+
+def test_template():
+    template = Template(SERVICE)
+    assert template.keys == {'P2POOL_DIR', 'DB4E_USER'}
+    assert template.render(VALUES) == \
+        'ExecStart=/opt/db4e/p2pool-4.8/bin/start-p2pool.sh /opt/db4e/p2pool-4.8/conf/%i.ini\nUser=sally\n'
+    assert template.check(dict(VALUES, XMRIG_DIR='/opt')) == ([], ['XMRIG_DIR'])
+    assert template.check({'DB4E_USER': 'sally'}) == (['P2POOL_DIR'], [])
+
+def test_template_cache(tmp_path):
+    template_file = tmp_path / 'p2pool@.service'
+    template_file.write_text(SERVICE)
+    template = get_template(str(template_file))
+    assert get_template(str(template_file)) is template
+    template_file.write_text('User=[[DB4E_USER]]\n')
+    assert get_template(str(template_file)).keys == {'DB4E_USER'}
+
+def test_render_units(tmp_path):
+    tmpl_dir, out_dir, installed_dir = tmp_path / 'tmpl', tmp_path / 'out', tmp_path / 'installed'
+    for path in (tmpl_dir, out_dir, installed_dir):
+        path.mkdir()
+    (tmpl_dir / 'p2pool@.service').write_text(SERVICE)
+    (tmpl_dir / 'p2pool@.socket').write_text('SocketUser=[[DB4E_USER]]\n')
+    units = [(str(tmpl_dir / 'p2pool@.service'), VALUES), (str(tmpl_dir / 'p2pool@.socket'), VALUES)]
+
+    # Nothing is written if a placeholder has no value
+    results = render_units(units + [(str(tmpl_dir / 'p2pool@.service'), {})], str(out_dir), str(installed_dir))
+    assert results['p2pool@.service']['status'] == 'error'
+    assert os.listdir(out_dir) == []
+
+    results = render_units(units, str(out_dir), str(installed_dir))
+    assert sorted(os.listdir(out_dir)) == ['p2pool@.service', 'p2pool@.socket']
+    assert 'P2POOL_DIR' in results['p2pool@.socket']['msg']
+
+    # Installed and unchanged units aren't written again
+    for unit in os.listdir(out_dir):
+        os.replace(out_dir / unit, installed_dir / unit)
+    render_units(units, str(out_dir), str(installed_dir))
+    assert os.listdir(out_dir) == []
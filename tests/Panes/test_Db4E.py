@@ -0,0 +1,92 @@
+import asyncio
+import pytest
+from textual.app import App
+from textual.widgets import Input, Label
+from db4e.Panes.Db4E import Db4E
+from db4e.Modules.HealthMgr import HealthMgr
+from db4e.Modules.PaneMgr import PaneMgr
+from db4e.Modules.PaneCatalogue import PaneCatalogue
+
+DB4E_REC = {
+    'group': 'db4e',
+    'install_dir': '/opt/db4e/src',
+    'user': 'sally',
+    'user_wallet': '48aTDJfRH2JLc',
+    'vendor_dir': '/opt/db4e',
+}
+
+class PaneApp(App):
+    def compose(self):
+        yield Db4E(id='Db4E')
+
+def test_set_data_patches_form():
+    async def run():
+        app = PaneApp()
+        async with app.run_test() as pilot:
+            pane = app.query_one(Db4E)
+            pane.set_data(DB4E_REC)
+            await pilot.pause()
+            num_widgets = len(pane.query('*'))
+            assert str(pane.query_one('#db4e_user', Label).content) == 'sally'
+            assert pane.query_one('#db4e_vendor_dir_input', Input).value == '/opt/db4e'
+
+            # The form isn't rebuilt, only the changed field is patched
+            wallet = pane.query_one('#db4e_user_wallet_input', Input)
+            for i in range(10):
+                pane.set_data(dict(DB4E_REC, user_wallet=f'48aTDJfRH2JLc{i}'))
+            await pilot.pause()
+            assert len(pane.query('*')) == num_widgets
+            assert pane.query_one('#db4e_user_wallet_input', Input) is wallet
+            assert wallet.value == '48aTDJfRH2JLc9'
+
+    asyncio.run(run())
+
+def test_set_health():
+    async def run():
+        app = PaneApp()
+        async with app.run_test() as pilot:
+            pane = app.query_one(Db4E)
+            pane.clear_health()
+            pane.set_health('Service', {'state': 'good', 'msg': 'The db4e service is running'})
+            pane.set_health('Deployment Directory', {'state': 'warning', 'msg': '/opt/db4e does not exist'})
+            await pilot.pause()
+            assert list(pane.health) == ['Service', 'Deployment Directory']
+            pane.clear_health()
+            assert pane.health == {}
+
+    asyncio.run(run())
+
+def test_set_health_before_mount():
+    # The results are kept and shown once the pane is mounted
+    pane = Db4E(id='Db4E')
+    pane.clear_health()
+    pane.set_health('Service', {'state': 'good', 'msg': 'The db4e service is running'})
+    assert list(pane.health) == ['Service']
+
+def test_health_through_pane_mgr(config, mocker, tmp_path):
+    mocker.patch('db4e.Modules.HealthMgr.SystemdMgr')
+    health_mgr = HealthMgr(config, probe_timeout=0.5)
+    health_mgr.systemd.status.return_value.installed = True
+    health_mgr.systemd.status.return_value.active = True
+    db4e_rec = dict(DB4E_REC, install_dir=str(tmp_path), vendor_dir=str(tmp_path / 'missing'))
+
+    class PaneMgrApp(App):
+        def compose(self):
+            self.pane_mgr = PaneMgr(config, PaneCatalogue(), True)
+            yield self.pane_mgr
+
+    async def run():
+        app = PaneMgrApp()
+        async with app.run_test() as pilot:
+            # Same steps as Db4EApp.load_nav_leaf(), the pane is built on first use
+            pane = await app.pane_mgr.set_pane(name='Db4E', data=db4e_rec)
+            pane.clear_health()
+            async for name, result in health_mgr.check(db4e_rec):
+                pane.set_health(name, result)
+            await pilot.pause()
+            assert pane.health['Install Directory']['state'] == 'good'
+            assert pane.health['Deployment Directory']['state'] == 'warning'
+            assert pane.health['Service']['state'] == 'good'
+            assert pane.query_one('#db4e_user_wallet_input', Input).value == '48aTDJfRH2JLc'
+
+    asyncio.run(run())
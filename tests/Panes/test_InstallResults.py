@@ -0,0 +1,35 @@
+import asyncio
+import pytest
+from textual.app import App
+from textual.widgets import Static
+from db4e.Panes.InstallResults import InstallResults
+from db4e.Modules.PaneMgr import PaneMgr
+from db4e.Modules.PaneCatalogue import PaneCatalogue
+
+RESULT = {'Create Directories': {'status': 'good', 'msg': 'Created /opt/db4e'}}
+
+def test_results_before_mount():
+    # The results are kept and shown once the pane is mounted
+    pane = InstallResults(id='InstallResults')
+    pane.start_progress()
+    pane.add_result(RESULT)
+    assert pane.task_list == [RESULT]
+
+def test_results_through_pane_mgr(config):
+    class PaneMgrApp(App):
+        def compose(self):
+            self.pane_mgr = PaneMgr(config, PaneCatalogue(), False)
+            yield self.pane_mgr
+
+    async def run():
+        app = PaneMgrApp()
+        async with app.run_test() as pilot:
+            # Same steps as Db4EApp.run_initial_setup(), the pane is built on first use
+            pane = await app.pane_mgr.set_pane(name='InstallResults')
+            pane.start_progress()
+            pane.add_result(RESULT)
+            await pilot.pause()
+            assert pane.task_list == [RESULT]
+            assert pane.query_one('#install_results_table', Static).content.row_count == 1
+
+    asyncio.run(run())
@@ -1,10 +1,30 @@
 # tests/conftest.py
 import sys
 import pytest
+import pymongo
+from pymongo.errors import PyMongoError
 from db4e.Modules.ConfigMgr import ConfigMgr
 
+@pytest.fixture(scope='session')
+def _mongodb_online():
+    # Pinged once per test run
+    client = pymongo.MongoClient('localhost', 27017, serverSelectionTimeoutMS=1000)
+    try:
+        client.admin.command('ping')
+        return True
+    except PyMongoError:
+        return False
+    finally:
+        client.close()
+
+@pytest.fixture
+def mongodb(_mongodb_online):
+    # For the tests that need a live MongoDB on localhost:27017
+    if not _mongodb_online:
+        pytest.skip('MongoDB is not reachable on localhost:27017')
+
 @pytest.fixture
-def config(monkeypatch):
+def config(monkeypatch, tmp_path):
     monkeypatch.setattr(sys, 'argv', ['test_script', '-b'])
     cfg = ConfigMgr("0.16.1")
 
@@ -21,6 +41,10 @@ def config(monkeypatch):
             "log_retention_days": 7,
             "metrics_collection": "metrics",
 
+        },
+        "db4e": {
+            # Not the user's ~/.cache/db4e
+            "depl_snapshot": str(tmp_path / "deployments.json"),
         }
     }
 
@@ -0,0 +1,71 @@
+# Startup-time budget for the db4e entry point. The import times come from
+# 'python -X importtime', run this file to print the report:
+#
+#   python tests/test_App.py [module]
+
+import os
+import sys
+import time
+import subprocess
+import pytest
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Cumulative import time of db4e.App (microseconds) and the time 'db4e -v'
+# may take, interpreter startup included (seconds)
+IMPORT_BUDGET = 200000
+VERSION_BUDGET = 1.0
+# Imported only when the UI is started
+UI_MODULES = ('textual', 'rich', 'pymongo', 'db4e.Db4EApp', 'db4e.Panes', 'db4e.Widgets')
+# The best of this many runs is used, to keep the noise down
+RUNS = 3
+
+def run_python(*args):
+    env = dict(os.environ, PYTHONPATH=ROOT_DIR)
+    return subprocess.run([sys.executable, *args], cwd=ROOT_DIR, env=env,
+                          capture_output=True, text=True)
+
+def import_times(module):
+    # Module -> (self, cumulative) import time in microseconds
+    proc = run_python('-X', 'importtime', '-c', f'import {module}')
+    assert proc.returncode == 0, proc.stderr
+    times = {}
+    for line in proc.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative, name = line[len('import time:'):].split('|')
+        times[name.strip()] = (int(self_us), int(cumulative))
+    return times
+
+def best_import_times(module):
+    return min((import_times(module) for _ in range(RUNS)), key=lambda times: times[module][1])
+
+def report(module, times, top=20):
+    lines = [f'{module}: {times[module][1] / 1000:.1f} ms', f'{"self [ms]":>10} {"cumulative":>10}  module']
+    slowest = sorted(times.items(), key=lambda item: item[1][1], reverse=True)[:top]
+    for name, (self_us, cumulative) in slowest:
+        lines.append(f'{self_us / 1000:10.1f} {cumulative / 1000:10.1f}  {name}')
+    return '\n'.join(lines)
+
+def test_import_budget():
+    times = best_import_times('db4e.App')
+    assert times['db4e.App'][1] < IMPORT_BUDGET, report('db4e.App', times)
+
+def test_no_ui_stack():
+    times = import_times('db4e.App')
+    ui_modules = [ name for name in times
+                   if any(name == ui or name.startswith(ui + '.') for ui in UI_MODULES) ]
+    assert not ui_modules
+
+def test_version_budget():
+    elapsed = []
+    for _ in range(RUNS):
+        start = time.monotonic()
+        proc = run_python('-m', 'db4e.App', '-v')
+        elapsed.append(time.monotonic() - start)
+        assert proc.returncode == 0 and proc.stdout.startswith('Db4e v')
+    assert min(elapsed) < VERSION_BUDGET
+
+if __name__ == '__main__':
+    module = sys.argv[1] if len(sys.argv) > 1 else 'db4e.App'
+    print(report(module, best_import_times(module)))